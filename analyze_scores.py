@@ -0,0 +1,255 @@
+# analyze_scores.py
+"""Aggregates arbiter judgments and regenerates the plots in experimental_data/.
+
+Loads the score table written by run_analysis.py (CSV, or Parquet with pandas)
+into NumPy columns and computes means, 95% confidence intervals and win rates per
+model, founder, topic and criterion with grouped array operations. Example:
+
+    python analyze_scores.py arbiter_scores.csv --output-dir experimental_data
+"""
+import argparse
+import csv
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# The score columns run_analysis.py writes are "<model>_<field>" for these fields
+SCORE_FIELDS = ["structure", "depth", "support", "rhetoric", "final"]
+MODELS = ["complex", "simple"]
+MODEL_COLORS = {"complex": "skyblue", "simple": "lightcoral"}
+# Every column ScoreTable reads; a table with a header but no rows still has all of them
+SCORE_COLUMNS = ["founder", "topic", "sample", "swapped"] + \
+    [f"{model}_{field}" for model in MODELS for field in SCORE_FIELDS] + ["winner", "error"]
+# Normal approximation; with only a handful of samples per group the interval is a little narrow
+Z_95 = 1.96
+
+class ScoreTable:
+    """Arbiter judgments as parallel columns, one row per sample.
+
+    `scores` has shape (rows, models, criteria), ordered as MODELS and
+    SCORE_FIELDS, with NaN wherever the arbiter gave no score.
+    """
+
+    def __init__(self, founder: np.ndarray, topic: np.ndarray, sample: np.ndarray, swapped: np.ndarray,
+                 scores: np.ndarray, winner: np.ndarray):
+        self.founder = founder
+        self.topic = topic
+        self.sample = sample
+        self.swapped = swapped
+        self.scores = scores
+        self.winner = winner
+
+    def __len__(self) -> int:
+        return len(self.founder)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List]) -> "ScoreTable":
+        def numeric(name: str) -> np.ndarray:
+            return np.array([np.nan if value in (None, "") else float(value) for value in columns[name]], dtype=float)
+
+        # Rows the arbiter failed on carry no scores at all
+        ok = np.array([error in (None, "") or (isinstance(error, float) and np.isnan(error)) for error in columns["error"]], dtype=bool)
+        scores = np.stack([np.stack([numeric(f"{model}_{field}") for field in SCORE_FIELDS], axis=1) for model in MODELS], axis=1)
+        return cls(
+            founder=np.array(columns["founder"], dtype=str)[ok],
+            topic=np.array(columns["topic"], dtype=str)[ok],
+            sample=np.array([int(value) for value in columns["sample"]], dtype=int)[ok],
+            swapped=np.array([str(value).lower() == "true" for value in columns["swapped"]], dtype=bool)[ok],
+            scores=scores[ok],
+            winner=np.array(["" if value is None else str(value) for value in columns["winner"]], dtype=str)[ok],
+        )
+
+def load_scores(paths: List[str]) -> ScoreTable:
+    """Reads and concatenates one or more score tables from run_analysis.py."""
+    columns: Dict[str, List] = {name: [] for name in SCORE_COLUMNS}
+    for path in paths:
+        if path.endswith(".parquet"):
+            import pandas as pd
+            frame = pd.read_parquet(path)
+            loaded = {name: frame[name].tolist() for name in frame.columns}
+        else:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                reader = csv.DictReader(f)
+                rows = list(reader)
+            loaded = {name: [row[name] for row in rows] for name in (reader.fieldnames or [])}
+        for name, values in loaded.items():
+            columns.setdefault(name, []).extend(values)
+        print(f"  - {path}: {len(next(iter(loaded.values()), []))} rows")
+    return ScoreTable.from_columns(columns)
+
+def grouped_stats(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Mean, 95% CI half-width and count of `values` for each distinct key, ignoring NaNs.
+
+    `values` may be 1-D or (rows, ...); statistics are taken over the rows. Keys
+    come back in order of first appearance.
+    """
+    labels, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    # Renumber the groups so they follow first appearance rather than sort order
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    inverse = rank[inverse.reshape(-1)]
+    labels = labels[order]
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    shape = (len(labels),) + values.shape[1:]
+    counts, sums = np.zeros(shape), np.zeros(shape)
+    np.add.at(counts, inverse, valid)
+    np.add.at(sums, inverse, filled)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+        squares = np.zeros(shape)
+        np.add.at(squares, inverse, np.where(valid, (values - means[inverse]) ** 2, 0.0))
+        std = np.sqrt(squares / (counts - 1))
+        half_width = np.where(counts > 1, Z_95 * std / np.sqrt(counts), np.nan)
+    return labels, means, half_width, counts
+
+def win_rates(keys: np.ndarray, winner: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Share of decided samples each model won per key: (labels, rates shaped (keys, models), decided counts)."""
+    decided = np.isin(winner, MODELS)
+    wins = np.stack([(winner == model).astype(float) for model in MODELS], axis=1)
+    wins[~decided] = np.nan
+    labels, rates, _, counts = grouped_stats(keys, wins)
+    return labels, rates, counts[:, 0]
+
+def founder_label(name: str) -> str:
+    return name.split(' ')[-1]
+
+def topic_labels(topics: np.ndarray, width: int = 24) -> List[str]:
+    """Short numbered axis labels, e.g. '1 - Should the United States...'."""
+    labels = []
+    for i, topic in enumerate(topics, start=1):
+        text = topic if len(topic) <= width else topic[:width - 3].rstrip() + "..."
+        labels.append(f"{i} - {text}")
+    return labels
+
+def summarize(table: ScoreTable) -> Dict[str, Dict]:
+    """All aggregate statistics, keyed by grouping."""
+    everything = np.zeros(len(table), dtype=int)
+    summary = {}
+    for name, keys in (("overall", everything), ("founder", table.founder), ("topic", table.topic),
+                       ("founder_topic", np.char.add(np.char.add(table.founder, "\x1f"), table.topic))):
+        labels, means, half_width, counts = grouped_stats(keys, table.scores)
+        _, rates, decided = win_rates(keys, table.winner)
+        summary[name] = {"labels": labels, "means": means, "ci": half_width, "counts": counts,
+                         "win_rates": rates, "decided": decided}
+    return summary
+
+def print_summary(summary: Dict[str, Dict]):
+    final = SCORE_FIELDS.index("final")
+    for name, title in (("overall", "Overall"), ("founder", "Per founder"), ("topic", "Per topic")):
+        stats = summary[name]
+        print(f"\n--- {title} ---")
+        for i, label in enumerate(stats["labels"]):
+            label = "All judgments" if name == "overall" else str(label)
+            parts = [f"{model} {stats['means'][i, m, final]:.1f} ± {np.nan_to_num(stats['ci'][i, m, final]):.1f}"
+                     for m, model in enumerate(MODELS)]
+            print(f"  - {label}: final score {', '.join(parts)}; complex won {stats['win_rates'][i, 0]:.0%} of {int(stats['decided'][i])}")
+    overall = summary["overall"]
+    print("\n--- Per criterion (all judgments) ---")
+    for f, field in enumerate(SCORE_FIELDS):
+        parts = [f"{model} {overall['means'][0, m, f]:.2f} ± {np.nan_to_num(overall['ci'][0, m, f]):.2f}" for m, model in enumerate(MODELS)]
+        print(f"  - {field}: {', '.join(parts)}")
+
+def write_summary(summary: Dict[str, Dict], path: str):
+    """Flattens every grouping into one long CSV: grouping, key, model, criterion, mean, ci95, n."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["grouping", "key", "model", "criterion", "mean", "ci95", "n", "win_rate"])
+        for name, stats in summary.items():
+            for i, label in enumerate(stats["labels"]):
+                key = "" if name == "overall" else str(label).replace("\x1f", " | ")
+                for m, model in enumerate(MODELS):
+                    for c, field in enumerate(SCORE_FIELDS):
+                        writer.writerow([name, key, model, field, f"{stats['means'][i, m, c]:.4f}",
+                                         f"{stats['ci'][i, m, c]:.4f}", int(stats['counts'][i, m, c]),
+                                         f"{stats['win_rates'][i, m]:.4f}"])
+    print(f"Summary statistics saved to {path}")
+
+def _bar_labels(ax, bars, fontsize: Optional[float] = None):
+    for bar in bars:
+        ax.annotate(f"{bar.get_height():.1f}", (bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                    xytext=(0, 3), textcoords="offset points", ha="center", va="bottom", fontsize=fontsize)
+
+def plot_all(summary: Dict[str, Dict], output_dir: str):
+    """Writes plot1_overall_average.png, plot2_average_per_agent.png and plot3_detailed_combined.png."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("ERROR: Plotting requires matplotlib. Install it with 'pip install matplotlib'.")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    final = SCORE_FIELDS.index("final")
+    names = [model.capitalize() for model in MODELS]
+    width = 0.4
+
+    overall = summary["overall"]
+    fig, ax = plt.subplots(figsize=(6, 5))
+    bars = ax.bar(names, overall["means"][0, :, final], yerr=np.nan_to_num(overall["ci"][0, :, final]),
+                  color=[MODEL_COLORS[model] for model in MODELS], width=0.8, capsize=4)
+    _bar_labels(ax, bars)
+    ax.set(title="Overall Average Score: Simple vs. Complex Model", xlabel="\nModel Type", ylabel="Average Final Score", ylim=(0, 100))
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_dir, "plot1_overall_average.png"))
+    plt.close(fig)
+
+    founders = summary["founder"]
+    x = np.arange(len(founders["labels"]))
+    fig, ax = plt.subplots(figsize=(9, 6))
+    for m, model in enumerate(MODELS):
+        bars = ax.bar(x + (m - 0.5) * width, founders["means"][:, m, final], width, label=names[m],
+                      yerr=np.nan_to_num(founders["ci"][:, m, final]), color=MODEL_COLORS[model], capsize=4)
+        _bar_labels(ax, bars)
+    ax.set_xticks(x, [founder_label(name) for name in founders["labels"]])
+    ax.set(title="Average Score per Agent: Simple vs. Complex Model", xlabel="\nHistorical Agent", ylabel="Average Final Score", ylim=(0, 100))
+    ax.legend(title="Model Type", bbox_to_anchor=(1.02, 1), loc="upper left", borderaxespad=0)
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_dir, "plot2_average_per_agent.png"))
+    plt.close(fig)
+
+    pairs = summary["founder_topic"]
+    founder_of = np.array([label.split("\x1f")[0] for label in pairs["labels"]])
+    topic_of = np.array([label.split("\x1f", 1)[1] for label in pairs["labels"]])
+    topics = summary["topic"]["labels"]
+    fig, axes = plt.subplots(1, len(founders["labels"]), figsize=(6 * len(founders["labels"]), 6), sharey=True, squeeze=False)
+    for ax, founder in zip(axes[0], founders["labels"]):
+        rows = founder_of == founder
+        # Bars go at each topic's global position, so every panel's x axis lines up
+        index = np.array([np.flatnonzero(topics == topic)[0] for topic in topic_of[rows]])
+        for m, model in enumerate(MODELS):
+            bars = ax.bar(index + (m - 0.5) * width, pairs["means"][rows, m, final], width,
+                          yerr=np.nan_to_num(pairs["ci"][rows, m, final]), color=MODEL_COLORS[model], capsize=3)
+            _bar_labels(ax, bars, fontsize=8)
+        ax.set_xticks(np.arange(len(topics)), topic_labels(topics), fontsize=8)
+        ax.set(title=founder_label(founder), xlabel="\nQuestion", ylim=(0, 100))
+    axes[0][0].set_ylabel("Final Score")
+    fig.suptitle("Final Scores: Simple vs. Complex per Agent and Question", fontsize=14)
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_dir, "plot3_detailed_combined.png"))
+    plt.close(fig)
+    print(f"Plots saved to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="Score tables written by run_analysis.py (.csv or .parquet).")
+    parser.add_argument("--output-dir", default="experimental_data", help="Where to write the three plots.")
+    parser.add_argument("--summary", help="Also write every statistic to this CSV.")
+    parser.add_argument("--no-plots", action="store_true")
+    args = parser.parse_args()
+
+    print("--- Loading arbiter scores ---")
+    table = load_scores(args.inputs)
+    if not len(table):
+        # Every arbiter call failed or was skipped; there is nothing to aggregate or plot
+        print("No scored rows found; nothing to summarize.")
+    else:
+        summary = summarize(table)
+        print_summary(summary)
+        if args.summary:
+            write_summary(summary, args.summary)
+        if not args.no_plots:
+            plot_all(summary, args.output_dir)
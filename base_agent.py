@@ -2,53 +2,248 @@
 import anthropic
 import json
 import re
+import threading
+import time
 from abc import ABC
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Union
 import dirtyjson
+from batch_dispatcher import BatchDispatcher, BatchRequestError
+from llm_backend import AnthropicBackend, LLMBackend
+from llm_client import run_sync
+from rate_limiter import RateLimitController
+from response_cache import ResponseCache, make_cache_key
+from tracing import estimate_cost, tracer
 
 class BaseAgent(ABC):
+    model = "claude-sonnet-4-5-20250929"
+    temperature = 0.2
+    max_tokens = 4000
+
+    # How often the reasoning response parsed locally vs. needed the extraction call
+    _parse_stats = {"local": 0, "fallback": 0}
+    _parse_stats_lock = threading.Lock()
+
+    # Token usage reported by the API, including prompt-cache reads and writes (see usage_stats)
+    _usage_stats = {
+        "requests": 0, "input_tokens": 0, "output_tokens": 0,
+        "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0,
+        "cache_read_requests": 0, "cache_read_seconds": 0.0,
+        "uncached_requests": 0, "uncached_seconds": 0.0,
+        "streamed_requests": 0, "first_token_seconds": 0.0, "streams_stopped_at_json": 0,
+    }
+    _usage_stats_lock = threading.Lock()
+
+    # Where every agent's requests go: the Anthropic API unless configure_backend installs another
+    backend: LLMBackend = AnthropicBackend()
+
+    # Optional response cache shared by every agent (see configure_cache)
+    response_cache: Optional[ResponseCache] = None
+
+    # When set, requests are queued into Message Batches instead of sent directly (see configure_batching)
+    batch_dispatcher: Optional[BatchDispatcher] = None
+
+    # Optional limiter shared by every agent's direct API calls: retries, rate budgets, adaptive concurrency
+    rate_limiter: Optional[RateLimitController] = None
+
+    # When True, responses are streamed and reading stops as soon as the JSON object closes (see configure_streaming)
+    streaming = False
+    # Top-level JSON string field whose text is handed to `on_stream_text` as it arrives
+    stream_field: Optional[str] = None
+
     def __init__(self, name: str):
         self.name = name
-        self.llm_client = anthropic.Anthropic()
 
-    def _execute_llm_call(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
-        """A simple, direct wrapper for the API call."""
+    @staticmethod
+    def configure_backend(backend: LLMBackend):
+        """Sends every agent's requests (and, via the dispatcher's backend, batches) to `backend`."""
+        BaseAgent.backend = backend
+
+    @staticmethod
+    def configure_cache(cache: Optional[ResponseCache]):
+        """Installs (or with None, removes) the response cache used by all agents."""
+        BaseAgent.response_cache = cache
+
+    @staticmethod
+    def configure_batching(dispatcher: Optional[BatchDispatcher]):
+        """Routes every agent's API calls through `dispatcher` (None sends them directly again)."""
+        BaseAgent.batch_dispatcher = dispatcher
+
+    @staticmethod
+    def configure_rate_limiter(limiter: Optional[RateLimitController]):
+        """Installs (or with None, removes) the rate limiter shared by all agents."""
+        BaseAgent.rate_limiter = limiter
+
+    @staticmethod
+    def configure_streaming(enabled: bool):
+        """Switches every agent between streamed and whole-response API calls."""
+        BaseAgent.streaming = enabled
+
+    @staticmethod
+    def _record_parse(outcome: str):
+        with BaseAgent._parse_stats_lock:
+            BaseAgent._parse_stats[outcome] += 1
+
+    @staticmethod
+    def parse_stats() -> Dict[str, Any]:
+        """Returns how many tasks parsed locally and how many fell back to the extraction call."""
+        with BaseAgent._parse_stats_lock:
+            stats = dict(BaseAgent._parse_stats)
+        total = stats["local"] + stats["fallback"]
+        stats["fallback_rate"] = stats["fallback"] / total if total else 0.0
+        return stats
+
+    @staticmethod
+    def _parse_json_response(text: str) -> Optional[Dict[str, Any]]:
+        """Pulls the JSON object out of a response locally, returning None if it can't."""
+        # Drop the reasoning block first so braces inside it can't confuse the match
+        cleaned = re.sub(r'<thinking>.*?</thinking>', '', text, flags=re.DOTALL)
+        json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
+        if not json_match:
+            return None
         try:
-            print(f"    > Contacting Anthropic API for {self.name}...")
-            message = self.llm_client.messages.create(
-                model="claude-sonnet-4-5-20250929", 
+            parsed = dirtyjson.loads(json_match.group(0))
+        except Exception:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+    @staticmethod
+    def _record_usage(usage: Any, seconds: float, first_token_seconds: Optional[float] = None, stopped_at_json: bool = False):
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        with BaseAgent._usage_stats_lock:
+            stats = BaseAgent._usage_stats
+            stats["requests"] += 1
+            stats["input_tokens"] += getattr(usage, "input_tokens", None) or 0
+            stats["output_tokens"] += getattr(usage, "output_tokens", None) or 0
+            stats["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", None) or 0
+            stats["cache_read_input_tokens"] += cache_read
+            bucket = "cache_read" if cache_read else "uncached"
+            stats[f"{bucket}_requests"] += 1
+            stats[f"{bucket}_seconds"] += seconds
+            if first_token_seconds is not None:
+                stats["streamed_requests"] += 1
+                stats["first_token_seconds"] += first_token_seconds
+                stats["streams_stopped_at_json"] += int(stopped_at_json)
+
+    @staticmethod
+    def usage_stats() -> Dict[str, Any]:
+        """Returns token usage summed over every API response, including prompt-cache reads and writes."""
+        with BaseAgent._usage_stats_lock:
+            stats = dict(BaseAgent._usage_stats)
+        total_input = stats["input_tokens"] + stats["cache_creation_input_tokens"] + stats["cache_read_input_tokens"]
+        stats["cache_read_rate"] = stats["cache_read_input_tokens"] / total_input if total_input else 0.0
+        # Mean latency of responses that did and didn't read from the prompt cache
+        for bucket in ("cache_read", "uncached"):
+            requests = stats[f"{bucket}_requests"]
+            stats[f"{bucket}_mean_seconds"] = stats[f"{bucket}_seconds"] / requests if requests else 0.0
+        streamed = stats["streamed_requests"]
+        stats["first_token_mean_seconds"] = stats["first_token_seconds"] / streamed if streamed else 0.0
+        return stats
+
+    @staticmethod
+    def _build_system(system_prompt: str, cached_context: Optional[str]) -> Union[str, List[Dict[str, Any]]]:
+        """Lays out the system prompt so its static prefix can be served from the prompt cache."""
+        if not cached_context:
+            return system_prompt
+        # The shared context goes first so every agent working for the same founder
+        # reuses one cache entry; the agent's own instructions get a second breakpoint.
+        return [
+            {"type": "text", "text": cached_context, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}},
+        ]
+
+    async def _execute_llm_call_async(self, system_prompt: str, user_prompt: str, max_tokens: int, cached_context: Optional[str] = None, on_stream_text: Optional[Callable[[str], None]] = None, sample: int = 0) -> str:
+        """A simple, direct wrapper for the API call on the shared async client.
+
+        `cached_context` (e.g. the persona profile) is sent ahead of the system
+        prompt and marked for prompt caching, so repeated calls only pay for it once.
+        In streaming mode, `on_stream_text` receives this agent's `stream_field` live.
+        `sample` > 0 asks for an independent draw of an otherwise identical request
+        (it only changes the response cache key).
+        """
+        with tracer.span("llm_call", agent=self.name, model=self.model) as span:
+            request = dict(
+                model=self.model,
                 max_tokens=max_tokens,
-                temperature=0.2,
-                system=system_prompt,
+                temperature=self.temperature,
+                system=self._build_system(system_prompt, cached_context),
                 messages=[{"role": "user", "content": user_prompt}]
             )
-            return message.content[0].text.strip()
-        except anthropic.APIError as e:
-            print(f"ERROR: Anthropic API error for agent {self.name}: {e}")
-            return f"({self.name} is unable to respond due to an API error.)"
-
-    def execute_task(self, system_prompt: str, user_prompt: str, max_tokens: int) -> Dict[str, Any]:
-        """Executes the robust two-step 'reason-then-extract' process."""
-        print(f"    > Executing task for agent: {self.name}...")
-
-        reasoning_response_str = self._execute_llm_call(system_prompt, user_prompt, max_tokens)
-        
-        if reasoning_response_str.startswith("("):
-            return {"error": "API call failed", "response": reasoning_response_str}
-
-        extraction_system_prompt = "You are an expert at extracting structured data. Extract the JSON object from the provided text. Output only the valid, raw JSON object and nothing else."
-        extraction_user_prompt = f"<text_to_parse>\n{reasoning_response_str}\n</text_to_parse>\n\nExtract the JSON object now."
-        
-        extracted_data_str = self._execute_llm_call(extraction_system_prompt, extraction_user_prompt, max_tokens=max_tokens)
-        
-        try:
-            json_match = re.search(r'\{.*\}', extracted_data_str, re.DOTALL)
-            if json_match:
-                json_string = json_match.group(0)
-                return dirtyjson.loads(json_string)
-            else:
-                raise ValueError("No JSON object found in the output to parse.")
-
-        except Exception as e:
-            print(f"ERROR: {self.name} failed to produce valid JSON even with dirtyjson. Error: {e}")
-            return {"error": "JSON parsing failed", "response": extracted_data_str}
\ No newline at end of file
+            backend = BaseAgent.backend
+            # A backend that isn't the real model (e.g. the fake) must not fill the cache with its replies
+            cache = BaseAgent.response_cache if backend.cacheable else None
+            cache_key = None
+            if cache is not None:
+                cache_key = make_cache_key(**request, sample=sample) if sample else make_cache_key(**request)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    print(f"    > Using cached response for {self.name}.")
+                    span.set(response_cache="hit")
+                    return cached
+            dispatcher = BaseAgent.batch_dispatcher
+            started = time.perf_counter()
+            first_token_seconds, stopped_at_json = None, False
+            try:
+                if dispatcher is not None:
+                    print(f"    > Queueing batched request for {self.name}...")
+                    message = await dispatcher.submit(request, label=self.name)
+                    response_text, usage = message.content[0].text.strip(), message.usage
+                else:
+                    print(f"    > {'Streaming from' if BaseAgent.streaming else 'Contacting'} {backend.name} for {self.name}...")
+                    response_text, usage, first_token_seconds, stopped_at_json = await backend.send(self, request, on_stream_text)
+                    response_text = response_text.strip()
+            except (anthropic.APIError, BatchRequestError) as e:
+                print(f"ERROR: Anthropic API error for agent {self.name}: {e}")
+                span.set(error=type(e).__name__)
+                return f"({self.name} is unable to respond due to an API error.)"
+            self._record_usage(usage, time.perf_counter() - started, first_token_seconds, stopped_at_json)
+            tokens = {field: getattr(usage, field, None) or 0 for field in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")}
+            span.set(mode="batch" if dispatcher is not None else "stream" if BaseAgent.streaming else "direct", **tokens,
+                     cost_usd=estimate_cost(self.model, *tokens.values(), batched=dispatcher is not None))
+            if cache is not None:
+                cache.set(cache_key, response_text)
+            return response_text
+
+    def _execute_llm_call(self, system_prompt: str, user_prompt: str, max_tokens: int, cached_context: Optional[str] = None, on_stream_text: Optional[Callable[[str], None]] = None, sample: int = 0) -> str:
+        return run_sync(self._execute_llm_call_async(system_prompt, user_prompt, max_tokens, cached_context, on_stream_text, sample))
+
+    async def execute_task_async(self, system_prompt: str, user_prompt: str, max_tokens: int, cached_context: Optional[str] = None, on_stream_text: Optional[Callable[[str], None]] = None, sample: int = 0) -> Dict[str, Any]:
+        """Executes the 'reason-then-extract' process, skipping the extraction call when the JSON parses locally."""
+        with tracer.span("agent_task", agent=self.name) as span:
+            print(f"    > Executing task for agent: {self.name}...")
+
+            reasoning_response_str = await self._execute_llm_call_async(system_prompt, user_prompt, max_tokens, cached_context, on_stream_text, sample)
+
+            if reasoning_response_str.startswith("("):
+                span.set(parse="api_error")
+                return {"error": "API call failed", "response": reasoning_response_str}
+
+            # Fast path: most responses already end in a well-formed JSON object
+            parsed = self._parse_json_response(reasoning_response_str)
+            if parsed is not None:
+                self._record_parse("local")
+                span.set(parse="local")
+                return parsed
+
+            print(f"    > Local JSON parsing failed for {self.name}; falling back to an extraction call...")
+            self._record_parse("fallback")
+            span.set(parse="fallback")
+            extraction_system_prompt = "You are an expert at extracting structured data. Extract the JSON object from the provided text. Output only the valid, raw JSON object and nothing else."
+            extraction_user_prompt = f"<text_to_parse>\n{reasoning_response_str}\n</text_to_parse>\n\nExtract the JSON object now."
+
+            extracted_data_str = await self._execute_llm_call_async(extraction_system_prompt, extraction_user_prompt, max_tokens=max_tokens, sample=sample)
+
+            parsed = self._parse_json_response(extracted_data_str)
+            if parsed is None:
+                print(f"ERROR: {self.name} failed to produce valid JSON even with dirtyjson.")
+                span.set(parse="failed")
+                return {"error": "JSON parsing failed", "response": extracted_data_str}
+            return parsed
+
+    def execute_task(self, system_prompt: str, user_prompt: str, max_tokens: int, cached_context: Optional[str] = None, on_stream_text: Optional[Callable[[str], None]] = None, sample: int = 0) -> Dict[str, Any]:
+        return run_sync(self.execute_task_async(system_prompt, user_prompt, max_tokens, cached_context, on_stream_text, sample))
+
+    async def run_async(self, system_prompt: str, user_prompt: str, cached_context: Optional[str] = None, on_stream_text: Optional[Callable[[str], None]] = None, sample: int = 0) -> Dict[str, Any]:
+        return await self.execute_task_async(system_prompt, user_prompt, self.max_tokens, cached_context, on_stream_text, sample)
+
+    def run(self, system_prompt: str, user_prompt: str, cached_context: Optional[str] = None, on_stream_text: Optional[Callable[[str], None]] = None, sample: int = 0) -> Dict[str, Any]:
+        return self.execute_task(system_prompt, user_prompt, self.max_tokens, cached_context, on_stream_text, sample)
@@ -0,0 +1,124 @@
+# batch_dispatcher.py
+import anthropic
+import asyncio
+import itertools
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from llm_backend import AnthropicBackend, LLMBackend
+
+class BatchRequestError(Exception):
+    """Raised to the caller of a batched request that errored, was canceled or expired."""
+
+class BatchDispatcher:
+    """Collects LLM requests from many pipelines and sends them as one Message Batch.
+
+    Pipelines `join` before they start and `leave` when they finish. A batch is
+    submitted once every active pipeline is waiting on a request, so each batch
+    holds the same stage for every founder and topic. Every pipeline then resumes
+    with its result and runs on to its next LLM call. This relies on each pipeline
+    having at most one request outstanding, which holds for both pipeline DAGs.
+
+    If some pipeline stays busy for `max_wait_seconds` without making a request,
+    the requests already collected are sent anyway, so a slow stage can't hold
+    the rest of the sweep forever.
+
+    Batches go to `backend` (the Message Batches API unless another is given).
+    """
+
+    def __init__(self, poll_interval: float = 10.0, max_wait_seconds: Optional[float] = 60.0, backend: Optional[LLMBackend] = None):
+        self.poll_interval = poll_interval
+        self.max_wait_seconds = max_wait_seconds
+        self.backend = backend or AnthropicBackend()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._pending: List[Tuple[str, Dict[str, Any], asyncio.Future]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._ids = itertools.count()
+        self.batches_submitted = 0
+        self.requests_batched = 0
+        self.seconds_waiting = 0.0
+
+    def join(self, count: int = 1):
+        """Registers `count` pipelines that will submit requests through this dispatcher."""
+        with self._lock:
+            self._active += count
+
+    def leave(self):
+        """Marks one pipeline as finished; the others may now be all that's left to wait for."""
+        with self._lock:
+            self._active -= 1
+            batch = self._take_batch_if_ready()
+        self._launch(batch)
+
+    async def submit(self, params: Dict[str, Any], label: str = "request") -> anthropic.types.Message:
+        """Queues one `messages.create` request and waits for its result from the next batch.
+
+        `label` (e.g. the agent's name) prefixes the request's custom_id, as in "Thinker-12".
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # custom_ids may only hold letters, digits, '_' and '-'
+        custom_id = f"{re.sub(r'[^A-Za-z0-9_-]', '_', label)[:48]}-{next(self._ids)}"
+        with self._lock:
+            self._loop = loop
+            self._pending.append((custom_id, params, future))
+            batch = self._take_batch_if_ready()
+            if batch is None and self._timer is None and self.max_wait_seconds is not None:
+                self._timer = loop.call_later(self.max_wait_seconds, self._flush_on_timeout)
+        self._launch(batch)
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batches": self.batches_submitted, "requests": self.requests_batched, "seconds_waiting": self.seconds_waiting}
+
+    def _take_batch_if_ready(self, force: bool = False) -> Optional[List[Tuple[str, Dict[str, Any], asyncio.Future]]]:
+        # Caller holds self._lock
+        if not self._pending or (not force and len(self._pending) < self._active):
+            return None
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush_on_timeout(self):
+        with self._lock:
+            self._timer = None
+            batch = self._take_batch_if_ready(force=True)
+        if batch:
+            print(f"    WARN: Sending a partial batch of {len(batch)} requests after waiting {self.max_wait_seconds:.0f}s.")
+        self._launch(batch)
+
+    def _launch(self, batch):
+        if batch:
+            # leave() runs on pipeline threads, so always hand the batch to the LLM event loop
+            asyncio.run_coroutine_threadsafe(self._run_batch(batch), self._loop)
+
+    async def _run_batch(self, batch: List[Tuple[str, Dict[str, Any], asyncio.Future]]):
+        started = time.perf_counter()
+        try:
+            results = await self._submit_and_collect([(custom_id, params) for custom_id, params, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.seconds_waiting += time.perf_counter() - started
+
+        for custom_id, _, future in batch:
+            result = results.get(custom_id)
+            if result is not None and result.type == "succeeded":
+                future.set_result(result.message)
+            else:
+                outcome = result.type if result is not None else "missing"
+                future.set_exception(BatchRequestError(f"Batched request {custom_id} did not succeed ({outcome})."))
+
+    async def _submit_and_collect(self, requests: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        results = await self.backend.send_batch(requests, self.poll_interval)
+        self.batches_submitted += 1
+        self.requests_batched += len(requests)
+        return results
@@ -0,0 +1,141 @@
+# benchmark_orchestration.py
+"""Compares end-to-end debate throughput for serial, concurrent and batched orchestration.
+
+The real HistoricalAgent pipelines and DebateOrchestrator run against
+FakeLLMBackend and a static retriever, so the numbers measure orchestration
+(scheduling, threads, batch barriers) under a controlled model latency rather
+than the API's mood. A debate is one topic x model type with every founder.
+Example:
+
+    python benchmark_orchestration.py --topics 4 --models simple complex --latency 0.2 --jitter 0.1
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import yaml
+
+from base_agent import BaseAgent
+from batch_dispatcher import BatchDispatcher
+from environment import DebateOrchestrator, run_batched_simulations, run_simulation_grid
+from fake_llm_backend import FakeLLMBackend
+from founders import build_founder_agents, build_specialist_agents
+from rate_limiter import RateLimitController
+from tracing import percentile
+from response_cache import MemoryLRUCache
+from specialist_agents import ResearcherAgent
+
+MODES = ["serial", "concurrent", "batched"]
+
+class StaticRAGSystem:
+    """Answers the Researcher's lookups with canned passages after `latency` seconds; no embedding model needed."""
+
+    index_version = "static"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def query_many(self, requests: List[Tuple[str, str, int]]) -> List[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [f"(Passage by {author} on: {topic})" for topic, author, _ in requests]
+
+def build_runs(topic_count: int, models: List[str], retrieval_latency: float) -> List[Tuple[DebateOrchestrator, str]]:
+    with open("prompts.yaml", "r") as f:
+        all_prompts = yaml.safe_load(f)
+    specialist_agents = build_specialist_agents(StaticRAGSystem(retrieval_latency))
+    agents = build_founder_agents(all_prompts, specialist_agents)
+    topics = [f"Benchmark topic {i}: should the United States adopt policy number {i}?" for i in range(1, topic_count + 1)]
+    return [(DebateOrchestrator(agents, topic), model_type) for model_type in models for topic in topics]
+
+def run_benchmark(mode: str, args: argparse.Namespace) -> Dict:
+    backend = FakeLLMBackend(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             batch_latency=args.batch_latency, seed=args.seed)
+    BaseAgent.configure_backend(backend)
+    # Retries go through the same controller the runners use; its concurrency cap is set well
+    # above what the benchmark drives, so only the retries (not throttling) show up in the timings
+    limiter = RateLimitController(initial_concurrency=64, max_retries=args.max_retries, base_delay=args.retry_delay) if args.max_retries else None
+    BaseAgent.configure_rate_limiter(limiter)
+    # Each mode starts cold: no response cache, and a fresh retrieval cache
+    BaseAgent.configure_cache(None)
+    ResearcherAgent.retrieval_cache = MemoryLRUCache(max_entries=1024)
+    runs = build_runs(args.topics, args.models, args.retrieval_latency)
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with output:
+        if mode == "serial":
+            for orchestrator, model_type in runs:
+                orchestrator.run_simulation(model_type, max_concurrency=1)
+        elif mode == "concurrent":
+            run_simulation_grid(runs, max_concurrency=args.max_concurrency)
+        else:
+            dispatcher = BatchDispatcher(poll_interval=0.0, backend=backend)
+            for model_type in args.models:
+                run_batched_simulations([orchestrator for orchestrator, m in runs if m == model_type], model_type, dispatcher)
+    wall = time.perf_counter() - started
+
+    stage_samples: Dict[str, List[float]] = {}
+    failed = pipelines = 0
+    for orchestrator, _ in runs:
+        for pipeline_run in orchestrator.pipeline_runs.values():
+            pipelines += 1
+            failed += pipeline_run.failure is not None
+            for stage, seconds in pipeline_run.stage_timings.items():
+                stage_samples.setdefault(stage, []).append(seconds)
+    return {
+        "mode": mode, "wall_seconds": wall, "debates": len(runs), "pipelines": pipelines, "failed_pipelines": failed,
+        "debates_per_minute": len(runs) / wall * 60, "pipelines_per_minute": pipelines / wall * 60, **backend.stats(),
+        "retries": limiter.stats()["retries"] if limiter else 0,
+        "stages": {stage: {"p50_seconds": statistics.median(samples), "p95_seconds": percentile(samples, 95)}
+                   for stage, samples in stage_samples.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--topics", type=int, default=4)
+    parser.add_argument("--models", nargs="+", choices=["simple", "complex"], default=["simple", "complex"])
+    parser.add_argument("--max-concurrency", type=int, default=6, help="Founder pipelines in flight in concurrent mode.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per API call.")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that fail with a 500. Batched failures, and direct ones with --max-retries 0, fail their pipeline.")
+    parser.add_argument("--max-retries", type=int, default=0, help="Retry failed direct calls through a RateLimitController this many times.")
+    parser.add_argument("--retry-delay", type=float, default=0.05, help="Base backoff in seconds for --max-retries.")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="Simulated seconds per Message Batch.")
+    parser.add_argument("--retrieval-latency", type=float, default=0.0, help="Simulated seconds per retrieval call.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also save the results as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipelines' own progress output.")
+    args = parser.parse_args()
+
+    results = [run_benchmark(mode, args) for mode in args.modes]
+    print(f"{'mode':>10} | {'wall s':>7} {'debates/min':>11} {'pipelines/min':>13} | {'requests':>8} {'batches':>7} {'errors':>6} {'retries':>7} {'failed':>6}")
+    for result in results:
+        print(f"{result['mode']:>10} | {result['wall_seconds']:>7.2f} {result['debates_per_minute']:>11.1f} {result['pipelines_per_minute']:>13.1f} | "
+              f"{result['requests']:>8} {result['batches']:>7} {result['errors']:>6} {result['retries']:>7} {result['failed_pipelines']:>6}")
+
+    stages = sorted({stage for result in results for stage in result["stages"]})
+    print(f"\n{'stage p50/p95 s':>16} | " + " | ".join(f"{result['mode']:>13}" for result in results))
+    for stage in stages:
+        cells = []
+        for result in results:
+            timing = result["stages"].get(stage)
+            cells.append(f"{timing['p50_seconds']:>6.2f}/{timing['p95_seconds']:<6.2f}" if timing else f"{'-':>13}")
+        print(f"{stage:>16} | " + " | ".join(cells))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
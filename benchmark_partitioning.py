@@ -0,0 +1,101 @@
+# benchmark_partitioning.py
+"""Compares author-filtered search on one global index against per-author partitions.
+
+Three layouts are timed: a global Chroma collection filtered by author, one Chroma
+collection per author, and the exact per-author NumPy matrices of NumpyBackend.
+
+Uses synthetic unit vectors (MiniLM's 384 dimensions) so the numbers isolate index
+layout from embedding cost. Example:
+
+    python benchmark_partitioning.py --authors 3 10 30 100 --chunks-per-author 500
+"""
+import argparse
+import statistics
+import time
+import uuid
+from typing import Dict, List
+
+import chromadb
+import numpy as np
+
+from retrieval_backends import NumpyBackend
+from tracing import percentile
+
+EMBEDDING_DIM = 384
+
+def _random_unit_vectors(rng: np.random.Generator, count: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _add_in_batches(client, collection, embeddings: np.ndarray, ids: List[str], metadatas: List[Dict]):
+    write_batch = client.get_max_batch_size()
+    for i in range(0, len(ids), write_batch):
+        collection.add(embeddings=embeddings[i:i + write_batch], ids=ids[i:i + write_batch],
+                       metadatas=metadatas[i:i + write_batch])
+
+def run_benchmark(author_count: int, chunks_per_author: int, queries: int, top_k: int, seed: int) -> Dict[str, float]:
+    rng = np.random.default_rng(seed)
+    client = chromadb.Client()
+    run_id = uuid.uuid4().hex[:8]
+    authors = [f"author{i}" for i in range(author_count)]
+
+    global_collection = client.create_collection(name=f"bench_{run_id}_global")
+    partitions = {}
+    exact = NumpyBackend(collection_name=f"bench_{run_id}")
+    for author in authors:
+        embeddings = _random_unit_vectors(rng, chunks_per_author)
+        ids = [f"{author}_{i}" for i in range(chunks_per_author)]
+        metadatas = [{"author": author} for _ in ids]
+        _add_in_batches(client, global_collection, embeddings, ids, metadatas)
+        partitions[author] = client.create_collection(name=f"bench_{run_id}_{author}")
+        _add_in_batches(client, partitions[author], embeddings, ids, metadatas)
+        exact.upsert(ids, embeddings, [""] * len(ids), [{"author": author, "source": author} for _ in ids])
+
+    query_vectors = _random_unit_vectors(rng, queries)
+    query_authors = [authors[i % author_count] for i in range(queries)]
+
+    timings = {"global": [], "partitioned": [], "numpy": []}
+    for vector, author in zip(query_vectors, query_authors):
+        started = time.perf_counter()
+        global_collection.query(query_embeddings=vector[None, :], n_results=top_k, where={"author": author})
+        timings["global"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        partitions[author].query(query_embeddings=vector[None, :], n_results=top_k)
+        timings["partitioned"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        exact.search(author, vector[None, :], top_k)
+        timings["numpy"].append(time.perf_counter() - started)
+
+    client.delete_collection(name=global_collection.name)
+    for collection in partitions.values():
+        client.delete_collection(name=collection.name)
+
+    return {
+        f"{layout}_{stat}": fn(samples) * 1000
+        for layout, samples in timings.items()
+        for stat, fn in (("p50_ms", statistics.median), ("p95_ms", lambda s: percentile(s, 95)))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--authors", type=int, nargs="+", default=[3, 10, 30, 100])
+    parser.add_argument("--chunks-per-author", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'authors':>8} {'chunks':>8} | {'global p50':>11} {'global p95':>11} | {'part. p50':>10} {'part. p95':>10} | "
+          f"{'numpy p50':>10} {'numpy p95':>10} | {'speedup':>7}")
+    for author_count in args.authors:
+        result = run_benchmark(author_count, args.chunks_per_author, args.queries, args.top_k, args.seed)
+        speedup = result["global_p50_ms"] / result["partitioned_p50_ms"] if result["partitioned_p50_ms"] else float("inf")
+        print(f"{author_count:>8} {author_count * args.chunks_per_author:>8} | "
+              f"{result['global_p50_ms']:>9.2f}ms {result['global_p95_ms']:>9.2f}ms | "
+              f"{result['partitioned_p50_ms']:>8.2f}ms {result['partitioned_p95_ms']:>8.2f}ms | "
+              f"{result['numpy_p50_ms']:>8.2f}ms {result['numpy_p95_ms']:>8.2f}ms | {speedup:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# benchmark_retrieval.py
+"""Measures RAGSystem build throughput, query latency, memory and recall@k at several corpus scales.
+
+Each scale builds the index from `corpora/` grown N-fold with synthetic
+paragraphs, which are resampled from each author's own sentences so every
+chunk stays distinct and on-voice. The benchmark then replays a fixed set of
+the principle, precedent and allied-thinker queries ResearcherAgent issues.
+Recall@k compares each backend's top k against exact brute-force search over
+the same embeddings. Every run is appended to a JSONL history and compared with
+the previous run. Example:
+
+    python benchmark_retrieval.py --scales 1 10 100 1000 --backends chroma numpy --k 1 3 10
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from rag_system import RAGSystem, _peak_rss_mb
+from response_cache import MemoryLRUCache
+from retrieval_backends import NumpyBackend, RetrievalBackend, create_backend
+from specialist_agents import ResearcherAgent
+from tracing import percentile
+
+# (topic, founder, Selector output) triples; each yields the queries ResearcherAgent would send for it
+QUERY_SCENARIOS = [
+    ("Should the federal government assume the states' war debts?", "Alexander Hamilton",
+     {"core_principle": "Public credit is the foundation of national strength.",
+      "historical_precedent": {"issue": "The assumption of state debts"}, "allied_thinker": {"name": "James Madison"}}),
+    ("Should the United States maintain a standing army in peacetime?", "Alexander Hamilton",
+     {"core_principle": "Energy in the executive is essential to good government.",
+      "historical_precedent": {"issue": "The Whiskey Rebellion"}, "allied_thinker": {"name": "James Madison"}}),
+    ("Should Congress charter a national bank?", "Thomas Jefferson",
+     {"core_principle": "Powers not delegated to the United States are reserved to the states.",
+      "historical_precedent": {"issue": "The Louisiana Purchase"}, "allied_thinker": {"name": "James Madison"}}),
+    ("Should the nation favor agriculture over manufacturing?", "Thomas Jefferson",
+     {"core_principle": "Those who labor in the earth are the chosen people of God.",
+      "historical_precedent": {"issue": "The Embargo Act of 1807"}, "allied_thinker": {"name": "Alexander Hamilton"}}),
+    ("How should a large republic guard against faction?", "James Madison",
+     {"core_principle": "Ambition must be made to counteract ambition.",
+      "historical_precedent": {"issue": "The Virginia and Kentucky Resolutions"}, "allied_thinker": {"name": "Thomas Jefferson"}}),
+    ("Should the Constitution include a bill of rights?", "James Madison",
+     {"core_principle": "Parchment barriers alone cannot restrain the encroaching spirit of power.",
+      "historical_precedent": {"issue": "The ratification debates in Virginia"}, "allied_thinker": {"name": "Alexander Hamilton"}}),
+]
+
+def researcher_queries() -> List[Tuple[str, str, int]]:
+    """The (query, author, top_k) requests ResearcherAgent makes for every scenario."""
+    researcher = ResearcherAgent(rag_system=None)
+    queries = []
+    for topic, founder, selector_output in QUERY_SCENARIOS:
+        queries.extend(researcher._core_queries(selector_output, topic, founder))
+        queries.extend(researcher._allied_queries(selector_output))
+    return queries
+
+def _sentences(paragraph: str) -> List[str]:
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', " ".join(paragraph.split())) if sentence]
+
+def _synthetic_paragraphs(text: str, copies: int, rng: random.Random) -> Iterator[str]:
+    """Yields `copies` new versions of every paragraph, each with the same number of
+    sentences drawn from anywhere in the file."""
+    paragraphs = [_sentences(paragraph) for paragraph in text.split('\n\n') if paragraph.strip()]
+    pool = [sentence for sentences in paragraphs for sentence in sentences]
+    for _ in range(copies):
+        for sentences in paragraphs:
+            yield " ".join(rng.choice(pool) for _ in sentences)
+
+def scale_corpora(corpora_path: str, scale: int, work_dir: str, seed: int) -> str:
+    """Writes (once) and returns a copy of the corpora `scale` times the size. Scale 1 is the corpora itself."""
+    if scale == 1:
+        return corpora_path
+    target = os.path.join(work_dir, f"corpora_x{scale}_seed{seed}")
+    if os.path.isdir(target):
+        return target
+    print(f"  - Generating {scale}x corpora in {target}...")
+    partial = target + ".partial"
+    os.makedirs(partial, exist_ok=True)
+    for filename in sorted(os.listdir(corpora_path)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(corpora_path, filename), 'r', encoding='utf-8') as f:
+            text = f.read()
+        rng = random.Random(f"{filename}|{seed}")
+        # Streamed paragraph by paragraph, so even the 1000x corpora never sit in memory
+        with open(os.path.join(partial, filename), 'w', encoding='utf-8') as f:
+            f.write(text.rstrip() + "\n\n")
+            for paragraph in _synthetic_paragraphs(text, scale - 1, rng):
+                f.write(paragraph + "\n\n")
+    os.replace(partial, target)
+    return target
+
+def _current_rss_mb() -> Optional[float]:
+    """Current resident memory in MB, where /proc reports it."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class RecordingBackend(RetrievalBackend):
+    """Passes everything through to `inner`, spilling a copy of each upsert to disk for the exact reference.
+
+    Spilling keeps the copy out of the memory measurement; the time it takes is
+    tracked so it can be left out of the build time too.
+    """
+
+    def __init__(self, inner: RetrievalBackend, spill_dir: str):
+        self.inner = inner
+        self.layout = inner.layout
+        self.spill_dir = spill_dir
+        self.spill_seconds = 0.0
+        self._spills: List[str] = []
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def reset(self):
+        self.inner.reset()
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        self.inner.upsert(ids, embeddings, documents, metadatas)
+        started = time.perf_counter()
+        stem = os.path.join(self.spill_dir, f"upsert_{len(self._spills)}")
+        np.save(stem + ".npy", np.asarray(embeddings, dtype=np.float32))
+        with open(stem + ".json", 'w', encoding='utf-8') as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+        self._spills.append(stem)
+        self.spill_seconds += time.perf_counter() - started
+
+    def delete_source(self, source: str, author: str):
+        self.inner.delete_source(source, author)
+
+    def search(self, author: str, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        return self.inner.search(author, query_embeddings, top_k)
+
+    def flush(self):
+        self.inner.flush()
+
+    def exact_reference(self) -> NumpyBackend:
+        """Brute-force search over every vector this backend was given."""
+        reference = NumpyBackend(collection_name="exact_reference")
+        for stem in self._spills:
+            with open(stem + ".json", 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+            reference.upsert(rows["ids"], np.load(stem + ".npy"), rows["documents"], rows["metadatas"])
+            os.remove(stem + ".npy")
+            os.remove(stem + ".json")
+        return reference
+
+def _recall(found: List[str], exact: List[str], k: int) -> float:
+    expected = set(exact[:k])
+    return len(set(found[:k]) & expected) / len(expected) if expected else 1.0
+
+def run_benchmark(corpora_path: str, scale: int, backend: str, ks: List[int], repeats: int, work_dir: str, **rag_options) -> Dict:
+    queries = researcher_queries()
+    recorder_dir = os.path.join(work_dir, f"spill_{uuid.uuid4().hex[:8]}")
+
+    gc.collect()
+    rss_before = _current_rss_mb()
+    started = time.perf_counter()
+    collection_name = f"bench_{uuid.uuid4().hex[:8]}"
+    recorder = RecordingBackend(create_backend(backend, collection_name), recorder_dir)
+    rag_system = RAGSystem(corpora_path=corpora_path, collection_name=collection_name, backend=recorder, **rag_options)
+    build_seconds = time.perf_counter() - started - recorder.spill_seconds
+    gc.collect()
+    rss_after = _current_rss_mb()
+    chunks = rag_system.build_stats.get("chunks", 0)
+
+    # Every call re-embeds its query, as a first-time ResearcherAgent lookup would
+    rag_system.query_embedding_cache = MemoryLRUCache(max_entries=0)
+    query_timings, search_timings = [], []
+    vectors = rag_system._encode_queries([text for text, _, _ in queries])
+    for _ in range(repeats):
+        for (text, author, top_k), vector in zip(queries, vectors):
+            query_started = time.perf_counter()
+            rag_system.query(text, author, top_k)
+            query_timings.append(time.perf_counter() - query_started)
+            search_started = time.perf_counter()
+            recorder.search(author, vector[None, :], top_k)
+            search_timings.append(time.perf_counter() - search_started)
+
+    reference = recorder.exact_reference()
+    recalls = {k: [] for k in ks}
+    for (_, author, _), vector in zip(queries, vectors):
+        found = recorder.search(author, vector[None, :], max(ks))[0]
+        exact = reference.search(author, vector[None, :], max(ks))[0]
+        for k in ks:
+            recalls[k].append(_recall(found, exact, k))
+
+    recorder.reset()
+    os.rmdir(recorder_dir)
+    return {
+        "scale": scale, "backend": backend, "chunks": chunks, "build_seconds": build_seconds,
+        "chunks_per_second": chunks / build_seconds if build_seconds > 0 else 0.0,
+        "index_memory_mb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "peak_memory_mb": _peak_rss_mb(),
+        "query_p50_ms": statistics.median(query_timings) * 1000, "query_p99_ms": percentile(query_timings, 99) * 1000,
+        "search_p50_ms": statistics.median(search_timings) * 1000, "search_p99_ms": percentile(search_timings, 99) * 1000,
+        **{f"recall_at_{k}": statistics.mean(values) for k, values in recalls.items()},
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_results(results: List[Dict], ks: List[int]):
+    recall_headers = " ".join(f"{f'R@{k}':>6}" for k in ks)
+    print(f"\n{'scale':>6} {'backend':>8} {'chunks':>8} | {'build s':>8} {'chunks/s':>9} {'index MB':>8} {'peak MB':>8} | "
+          f"{'query p50':>9} {'query p99':>9} {'search p50':>10} {'search p99':>10} | {recall_headers}")
+    for result in results:
+        index_mb = f"{result['index_memory_mb']:>8.1f}" if result["index_memory_mb"] is not None else f"{'n/a':>8}"
+        peak_mb = f"{result['peak_memory_mb']:>8.0f}" if result["peak_memory_mb"] is not None else f"{'n/a':>8}"
+        recalls = " ".join(f"{result[f'recall_at_{k}']:>6.3f}" for k in ks)
+        print(f"{result['scale']:>5}x {result['backend']:>8} {result['chunks']:>8} | {result['build_seconds']:>8.2f} "
+              f"{result['chunks_per_second']:>9.1f} {index_mb} {peak_mb} | {result['query_p50_ms']:>7.2f}ms {result['query_p99_ms']:>7.2f}ms "
+              f"{result['search_p50_ms']:>8.2f}ms {result['search_p99_ms']:>8.2f}ms | {recalls}")
+
+def print_comparison(results: List[Dict], history: List[Dict]):
+    """Ratios against the most recent earlier run of each (scale, backend)."""
+    earlier = {}
+    for run in history:
+        for row in run["results"]:
+            earlier[(row["scale"], row["backend"])] = (run, row)
+    lines = []
+    for result in results:
+        if (result["scale"], result["backend"]) not in earlier:
+            continue
+        run, before = earlier[(result["scale"], result["backend"])]
+        changes = []
+        for field in ("chunks_per_second", "query_p50_ms", "search_p50_ms"):
+            if before[field]:
+                changes.append(f"{field} {result[field] / before[field]:.2f}x")
+        for field in sorted((key for key in result if key.startswith("recall_at_") and key in before), key=lambda key: int(key[10:])):
+            changes.append(f"{field} {result[field] - before[field]:+.3f}")
+        lines.append(f"  - {result['scale']}x {result['backend']} vs {run['timestamp']} (commit {run.get('commit') or 'unknown'}): "
+                     + ", ".join(changes))
+    if lines:
+        print("\nCompared with earlier runs:")
+        print("\n".join(lines))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpora", default="corpora")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--backends", nargs="+", choices=["chroma", "numpy"], default=["chroma", "numpy"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 10], help="Cutoffs to report recall at.")
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the query set for the latency percentiles.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-tokens", type=int, default=200)
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=40)
+    parser.add_argument("--min-chunk-tokens", type=int, default=50)
+    parser.add_argument("--dense-only", action="store_true", help="Query without BM25 fusion.")
+    parser.add_argument("--rerank", choices=["phrase", "cross-encoder"], help="Rerank the fused candidates.")
+    parser.add_argument("--work-dir", default="benchmark_data", help="Where scaled corpora are generated and kept.")
+    parser.add_argument("--history", default=os.path.join("benchmark_results", "retrieval.jsonl"),
+                        help="JSONL file each run is appended to and compared against.")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        corpora_path = scale_corpora(args.corpora, scale, args.work_dir, args.seed)
+        for backend in args.backends:
+            print(f"\n--- {scale}x corpora, {backend} backend ---")
+            results.append(run_benchmark(corpora_path, scale, backend, sorted(args.k), args.repeats, args.work_dir,
+                                         chunk_tokens=args.chunk_tokens, chunk_overlap_tokens=args.chunk_overlap_tokens,
+                                         min_chunk_tokens=args.min_chunk_tokens, hybrid=not args.dense_only, rerank=args.rerank))
+    print_results(results, sorted(args.k))
+
+    print_comparison(results, load_history(args.history))
+    record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": _git_commit(), "settings": vars(args), "results": results}
+    if os.path.dirname(args.history):
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nResults appended to {args.history}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# checkpoint_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from response_cache import make_cache_key
+
+def new_run_id() -> str:
+    """A sortable, unique id for a fresh run, e.g. 20250101-120000-1a2b3c."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+class CheckpointStore:
+    """Persists each pipeline stage's outputs so an interrupted run can resume where it stopped.
+
+    Checkpoints are scoped to a run id and keyed by (founder, topic, model type,
+    stage, hash of the stage's inputs). A stage whose inputs changed therefore
+    never reuses a stale checkpoint.
+    """
+
+    def __init__(self, run_id: Optional[str] = None, path: str = os.path.join("checkpoints", "checkpoints.sqlite3")):
+        self.run_id = run_id or new_run_id()
+        self.path = path
+        self.restored = 0
+        self.saved = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " run_id TEXT NOT NULL, founder TEXT NOT NULL, topic TEXT NOT NULL, model_type TEXT NOT NULL,"
+            " stage TEXT NOT NULL, input_hash TEXT NOT NULL, outputs TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (run_id, founder, topic, model_type, stage, input_hash))"
+        )
+
+    @staticmethod
+    def input_hash(inputs: Dict[str, Any]) -> str:
+        return make_cache_key(**inputs)
+
+    def load(self, founder: str, topic: str, model_type: str, stage: str, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = (self.run_id, founder, topic, model_type, stage, self.input_hash(inputs))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT outputs FROM checkpoints WHERE run_id = ? AND founder = ? AND topic = ? AND model_type = ?"
+                " AND stage = ? AND input_hash = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            self.restored += 1
+        return json.loads(row[0])
+
+    def save(self, founder: str, topic: str, model_type: str, stage: str, inputs: Dict[str, Any], outputs: Dict[str, Any]):
+        key = (self.run_id, founder, topic, model_type, stage, self.input_hash(inputs))
+        payload = json.dumps(outputs, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, founder, topic, model_type, stage, input_hash, outputs, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", key + (payload, time.time())
+            )
+            self.saved += 1
+
+    def scope(self, founder: str, topic: str, model_type: str) -> "StageCheckpoints":
+        """Binds this store to one founder's pipeline for one topic and model type."""
+        return StageCheckpoints(self, founder, topic, model_type)
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """Lists the runs in the store with how many stage checkpoints each has, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, COUNT(*), MAX(created_at) FROM checkpoints GROUP BY run_id ORDER BY MAX(created_at) DESC"
+            ).fetchall()
+        return [{"run_id": run_id, "checkpoints": count, "updated_at": updated} for run_id, count, updated in rows]
+
+    def has_run(self, run_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM checkpoints WHERE run_id = ? LIMIT 1", (run_id,)).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class StageCheckpoints:
+    """A CheckpointStore bound to one pipeline execution; this is what Pipeline.run consults."""
+
+    def __init__(self, store: CheckpointStore, founder: str, topic: str, model_type: str):
+        self.store = store
+        self.founder = founder
+        self.topic = topic
+        self.model_type = model_type
+
+    def load(self, stage: str, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.store.load(self.founder, self.topic, self.model_type, stage, inputs)
+
+    def save(self, stage: str, inputs: Dict[str, Any], outputs: Dict[str, Any]):
+        self.store.save(self.founder, self.topic, self.model_type, stage, inputs, outputs)
@@ -0,0 +1,168 @@
+# chunking.py
+import re
+from typing import Callable, Iterator, List, Tuple
+
+# A sentence runs to terminal punctuation (plus any closing quotes or brackets) followed by whitespace
+_SENTENCE = re.compile(r'\S.*?(?:[.!?]+["\')\]]*(?=\s)|\Z)', re.S)
+_WORD = re.compile(r'\S+')
+_APPROXIMATE_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+def approximate_token_counts(texts: List[str]) -> List[int]:
+    """Words and punctuation marks per text: a stand-in for models that don't expose a tokenizer."""
+    return [len(_APPROXIMATE_TOKEN.findall(text)) for text in texts]
+
+def tokenizer_token_counts(tokenizer) -> TokenCounter:
+    """Counts tokens with a Hugging Face tokenizer, without the [CLS]/[SEP] special tokens."""
+    def count(texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+    return count
+
+class Chunk:
+    """One chunk of a file: its text, token count and [start_byte, end_byte) span in the file."""
+
+    def __init__(self, text: str, start_byte: int, end_byte: int, token_count: int):
+        self.text = text
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.token_count = token_count
+
+class _Unit:
+    """A sentence (or a piece of an over-long one) with its byte span and token count."""
+
+    def __init__(self, text: str, start_byte: int, end_byte: int, tokens: int, paragraph: int):
+        self.text = text
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.tokens = tokens
+        self.paragraph = paragraph
+
+def iter_paragraphs(filepath: str) -> Iterator[Tuple[str, int]]:
+    """Streams a file's blank-line-separated paragraphs as (raw text, start byte), one line at a time."""
+    lines: List[bytes] = []
+    start = offset = 0
+    with open(filepath, 'rb') as f:
+        for line in f:
+            if line.strip():
+                if not lines:
+                    start = offset
+                lines.append(line)
+            elif lines:
+                yield b"".join(lines).decode('utf-8'), start
+                lines = []
+            offset += len(line)
+    if lines:
+        yield b"".join(lines).decode('utf-8'), start
+
+def _spans(pattern: re.Pattern, text: str, base_byte: int) -> Iterator[Tuple[str, int, int]]:
+    """Yields (match, start byte, end byte) for each match, converting character offsets as it goes."""
+    byte, char = base_byte, 0
+    for match in pattern.finditer(text):
+        byte += len(text[char:match.start()].encode('utf-8'))
+        end_byte = byte + len(match.group().encode('utf-8'))
+        yield match.group(), byte, end_byte
+        byte, char = end_byte, match.end()
+
+class TokenChunker:
+    """Packs whole sentences into chunks of about `chunk_tokens` tokens.
+
+    - Consecutive chunks within a paragraph share up to `overlap_tokens` tokens of
+      trailing sentences, so a passage cut at a boundary still appears whole once.
+    - A new paragraph starts a new chunk, unless the current one is still under
+      `min_chunk_tokens`; short paragraphs are merged forward instead of dropped.
+    - A sentence longer than `chunk_tokens` is split between words.
+    Files are read paragraph by paragraph, and chunks are yielded as they fill.
+    """
+
+    def __init__(self, count_tokens: TokenCounter = approximate_token_counts, chunk_tokens: int = 200,
+                 overlap_tokens: int = 40, min_chunk_tokens: int = 50):
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError(f"overlap_tokens must be between 0 and chunk_tokens ({chunk_tokens}); got {overlap_tokens}.")
+        self.count_tokens = count_tokens
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+
+    @property
+    def signature(self) -> str:
+        """Identifies the settings; a persistent index built with different ones must be rebuilt."""
+        return f"tokens:{self.chunk_tokens}/{self.overlap_tokens}/{self.min_chunk_tokens}"
+
+    def _units(self, paragraph: str, start_byte: int, index: int) -> List[_Unit]:
+        sentences = list(_spans(_SENTENCE, paragraph, start_byte))
+        counts = self.count_tokens([" ".join(text.split()) for text, _, _ in sentences])
+        units = []
+        for (text, start, end), tokens in zip(sentences, counts):
+            if tokens <= self.chunk_tokens:
+                units.append(_Unit(" ".join(text.split()), start, end, tokens, index))
+            else:
+                units.extend(self._split_sentence(text, start, index))
+        return units
+
+    def _split_sentence(self, sentence: str, start_byte: int, index: int) -> List[_Unit]:
+        """Splits an over-long sentence into runs of whole words of at most `chunk_tokens` tokens."""
+        words = list(_spans(_WORD, sentence, start_byte))
+        pieces, current, total = [], [], 0
+        for (word, start, end), tokens in zip(words, self.count_tokens([word for word, _, _ in words])):
+            if current and total + tokens > self.chunk_tokens:
+                pieces.append(current)
+                current, total = [], 0
+            current.append((word, start, end))
+            total += tokens
+        if current:
+            pieces.append(current)
+        units = []
+        for piece in pieces:
+            text = " ".join(word for word, _, _ in piece)
+            units.append(_Unit(text, piece[0][1], piece[-1][2], self.count_tokens([text])[0], index))
+        return units
+
+    @staticmethod
+    def _chunk(units: List[_Unit]) -> Chunk:
+        parts = []
+        for i, unit in enumerate(units):
+            if i:
+                parts.append("\n\n" if unit.paragraph != units[i - 1].paragraph else " ")
+            parts.append(unit.text)
+        return Chunk("".join(parts), units[0].start_byte, units[-1].end_byte, sum(unit.tokens for unit in units))
+
+    def _overlap(self, units: List[_Unit]) -> List[_Unit]:
+        """The trailing sentences of a full chunk that fit in `overlap_tokens`, to open the next one."""
+        kept, total = [], 0
+        for unit in reversed(units):
+            if total + unit.tokens > self.overlap_tokens or unit.paragraph != units[-1].paragraph:
+                break
+            kept.append(unit)
+            total += unit.tokens
+        return kept[::-1]
+
+    def chunk_file(self, filepath: str) -> Iterator[Chunk]:
+        buffer: List[_Unit] = []
+        total = 0
+        # Whether the buffer holds anything beyond the overlap carried from the previous chunk
+        fresh = False
+        for index, (paragraph, start_byte) in enumerate(iter_paragraphs(filepath)):
+            units = self._units(paragraph, start_byte, index)
+            paragraph_tokens = sum(unit.tokens for unit in units)
+            if buffer and total >= self.min_chunk_tokens and total + paragraph_tokens > self.chunk_tokens:
+                # Break at the paragraph boundary rather than mid-paragraph
+                if fresh:
+                    yield self._chunk(buffer)
+                buffer, total, fresh = [], 0, False
+            for unit in units:
+                if buffer and total + unit.tokens > self.chunk_tokens:
+                    if fresh:
+                        yield self._chunk(buffer)
+                    buffer = self._overlap(buffer)
+                    total = sum(carried.tokens for carried in buffer)
+                    fresh = False
+                    if total + unit.tokens > self.chunk_tokens:
+                        buffer, total = [], 0
+                buffer.append(unit)
+                total += unit.tokens
+                fresh = True
+        if buffer and fresh:
+            yield self._chunk(buffer)
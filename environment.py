@@ -1,31 +1,163 @@
 # environment.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from base_agent import BaseAgent
+from batch_dispatcher import BatchDispatcher
+from checkpoint_store import CheckpointStore
 from historical_agent import HistoricalAgent
-from typing import List, Literal
+from pipeline import PipelineRun
+from typing import Dict, List, Literal, Optional, Tuple
+
+class _LiveConsole:
+    """Echoes streamed final statements, starting a labelled line whenever the speaking run changes.
+
+    One per process: every orchestrator in a grid writes to the same terminal.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._speaker: Optional[str] = None
+
+    def write(self, label: str, text: str):
+        with self._lock:
+            if self._speaker != label:
+                print(f"\n[{label}, live] ", end="")
+                self._speaker = label
+            print(text, end="", flush=True)
+
+    def end_line(self, label: str):
+        """Ends `label`'s live line, unless another run has already taken over the console."""
+        with self._lock:
+            if self._speaker == label:
+                print() # End the live statement's line
+                self._speaker = None
+
+live_console = _LiveConsole()
+
+def _short_topic(topic: str, limit: int = 48) -> str:
+    return topic if len(topic) <= limit else topic[:limit - 3].rstrip() + "..."
 
 class DebateOrchestrator:
     """Manages a single-iteration simulation for comparative analysis."""
-    def __init__(self, agents: List[HistoricalAgent], topic: str):
+    def __init__(self, agents: List[HistoricalAgent], topic: str, checkpoint_store: Optional[CheckpointStore] = None):
         self.agents = agents
         self.topic = topic
+        # Stage outputs are saved here, and restored from it when resuming a run
+        self.checkpoint_store = checkpoint_store
         self.final_statements = [f"# Simulation Topic: {self.topic}\n"]
+        # Per-founder stage wall times from the most recent simulation
+        self.stage_timings: Dict[str, Dict[str, float]] = {}
+        # Per-founder pipeline runs and final responses from the most recent simulation
+        self.pipeline_runs: Dict[str, PipelineRun] = {}
+        self.responses: Dict[str, str] = {}
+
+    def _generate_response(self, agent: HistoricalAgent, model_type: str) -> str:
+        print(f"\nGenerating response for {agent.name}...")
+        context = f"The topic for consideration is: {self.topic}"
+        # Labelled per run: the same founder may be speaking on several topics at once
+        label = f'{agent.name}, {model_type}, "{_short_topic(self.topic)}"'
+        try:
+            pipeline_run = agent.run_pipeline(model_type, self.topic, context, self.checkpoint_store,
+                                              statement_listener=lambda text: live_console.write(label, text))
+            self.stage_timings[agent.name] = pipeline_run.stage_timings
+            self.pipeline_runs[agent.name] = pipeline_run
+            response = pipeline_run.result
+        except Exception as e:
+            # Contain the failure to this founder so the rest of the run still completes
+            live_console.end_line(label)
+            print(f"ERROR: Pipeline for {agent.name} raised an exception: {e}")
+            return f"({agent.name}'s pipeline failed: {e})"
+        live_console.end_line(label)
+        print(f"Response for {agent.name} generated.")
+        return response
+
+    def _generate_batched_response(self, agent: HistoricalAgent, model_type: str, dispatcher: BatchDispatcher) -> str:
+        try:
+            return self._generate_response(agent, model_type)
+        finally:
+            # A finished pipeline must stop counting towards the batch barrier
+            dispatcher.leave()
+
+    def run_simulation(self, model_type: Literal['simple', 'complex'], max_concurrency: int = 1, batch_dispatcher: Optional[BatchDispatcher] = None):
+        """Runs every founder's pipeline, up to `max_concurrency` of them at the same time.
+
+        With a `batch_dispatcher`, all pipelines instead run in lockstep through the
+        Message Batches API (see run_batched_simulations). Statements are always appended in
+        the order of `self.agents`, regardless of which pipeline finishes first.
+        """
+        if batch_dispatcher is not None:
+            run_batched_simulations([self], model_type, batch_dispatcher)
+            return
 
-    def run_simulation(self, model_type: Literal['simple', 'complex']):
-        method_name = f"generate_{model_type}_response"
         print(f"--- Running {model_type.upper()} Model Simulation ---")
-        self.final_statements.append(f"## {model_type.upper()} Model Outputs\n")
+        if max_concurrency > 1 and len(self.agents) > 1:
+            with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="founder") as executor:
+                futures = [executor.submit(self._generate_response, agent, model_type) for agent in self.agents]
+                responses = [future.result() for future in futures]
+        else:
+            responses = [self._generate_response(agent, model_type) for agent in self.agents]
+        self._record_responses(model_type, responses)
 
-        for agent in self.agents:
-            print(f"\nGenerating response for {agent.name}...")
-            context = f"The topic for consideration is: {self.topic}"
-            response_method = getattr(agent, method_name)
-            response = response_method(self.topic, context)
+    def _record_responses(self, model_type: str, responses: List[str]):
+        self.final_statements.append(f"## {model_type.upper()} Model Outputs\n")
+        for agent, response in zip(self.agents, responses):
+            self.responses[agent.name] = response
             statement = f"### {agent.name}:\n{response}\n"
             self.final_statements.append(statement)
-            print(f"Response for {agent.name} generated.")
         print("\n--- Simulation Complete ---")
+        self.print_stage_timings()
+
+    def print_stage_timings(self):
+        for founder, timings in self.stage_timings.items():
+            summary = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in timings.items())
+            print(f"Stage times for {founder}: {summary}")
 
     def save_transcript(self, filename: str):
         final_transcript = "\n".join(self.final_statements)
         with open(filename, "w", encoding='utf-8') as f:
             f.write(final_transcript)
-        print(f"\nSimulation results saved to {filename}")
\ No newline at end of file
+        print(f"\nSimulation results saved to {filename}")
+
+def run_simulation_grid(runs: List[Tuple[DebateOrchestrator, str]], max_concurrency: int = 4):
+    """Runs several (orchestrator, model type) simulations, e.g. a topics x models grid, as one pool of founder pipelines.
+
+    At most `max_concurrency` pipelines are in flight across the whole grid, so
+    throughput scales with the grid rather than with the slowest topic.
+    """
+    jobs = [(orchestrator, model_type, agent) for orchestrator, model_type in runs for agent in orchestrator.agents]
+    print(f"--- Running simulation grid: {len(runs)} simulations, {len(jobs)} pipelines, {max_concurrency} at a time ---")
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="grid-founder") as executor:
+        futures = [executor.submit(orchestrator._generate_response, agent, model_type) for orchestrator, model_type, agent in jobs]
+        responses = [future.result() for future in futures]
+
+    for orchestrator, model_type in runs:
+        orchestrator._record_responses(model_type, responses[:len(orchestrator.agents)])
+        responses = responses[len(orchestrator.agents):]
+
+def run_batched_simulations(orchestrators: List[DebateOrchestrator], model_type: Literal['simple', 'complex'], dispatcher: Optional[BatchDispatcher] = None) -> BatchDispatcher:
+    """Runs every founder of every orchestrator (i.e. every topic) through shared Message Batches.
+
+    Each pipeline step becomes one batch holding that stage for all founders and
+    topics, which trades latency for throughput and the batch discount on big sweeps.
+    Returns the dispatcher so callers can report its stats.
+    """
+    dispatcher = dispatcher or BatchDispatcher(backend=BaseAgent.backend)
+    jobs = [(orchestrator, agent) for orchestrator in orchestrators for agent in orchestrator.agents]
+    print(f"--- Running {model_type.upper()} Model Simulation in batch mode ({len(jobs)} pipelines) ---")
+
+    # Every pipeline joins before any starts, so the first batch can't go out short
+    dispatcher.join(len(jobs))
+    BaseAgent.configure_batching(dispatcher)
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(jobs), 1), thread_name_prefix="batched-founder") as executor:
+            futures = [executor.submit(orchestrator._generate_batched_response, agent, model_type, dispatcher) for orchestrator, agent in jobs]
+            responses = [future.result() for future in futures]
+    finally:
+        BaseAgent.configure_batching(None)
+
+    for orchestrator in orchestrators:
+        orchestrator._record_responses(model_type, responses[:len(orchestrator.agents)])
+        responses = responses[len(orchestrator.agents):]
+    stats = dispatcher.stats()
+    print(f"Batch mode: {stats['requests']} requests in {stats['batches']} batches, {stats['seconds_waiting']:.1f}s waiting on batches.")
+    return dispatcher
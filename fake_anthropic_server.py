@@ -0,0 +1,286 @@
+# fake_anthropic_server.py
+"""A local stand-in for the Anthropic Messages and Message Batches APIs.
+
+Every request gets the same canned reply: a <thinking> block followed by one JSON
+object holding the keys each agent in the pipelines reads. Point the runners at it
+to exercise the orchestration (including batch mode) without spending tokens:
+
+    python fake_anthropic_server.py --port 8765 --batch-latency 2
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=fake python run_simple_model.py --batch
+
+With --requests-per-minute it enforces a sliding-window request limit, answering
+429 with `retry-after` once the window is full and reporting `anthropic-ratelimit-*`
+headers on every reply; --overload-rate injects random 529s.
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+CANNED_JSON = {
+    "core_principle": "A government must be energetic enough to secure the public good.",
+    "historical_precedent": {"issue": "The assumption of state debts", "year": 1790},
+    "allied_thinker": {"name": "John Jay"},
+    "argument": "The proposal should be judged by whether it strengthens the Union.",
+    "winning_argument_text": "The proposal should be judged by whether it strengthens the Union.",
+    "final_argument_text": "The proposal should be judged by whether it strengthens the Union.",
+    "final_statement": "Gentlemen, the question before us is whether this measure strengthens the Union.",
+    "scores": {
+        "argument_A": {"structure_score": 7, "depth_score": 7, "support_score": 7, "rhetoric_score": 7, "final_score": 70},
+        "argument_B": {"structure_score": 9, "depth_score": 9, "support_score": 9, "rhetoric_score": 9, "final_score": 90},
+    },
+    "winning_argument": "Argument B",
+    "justification": "Canned reply from the fake server.",
+}
+# The trailing remark lets streaming clients show they stop reading at the closing brace
+CANNED_TEXT = "<thinking>Canned reasoning.</thinking>\n" + json.dumps(CANNED_JSON) + "\n\nLet me know if you need anything else."
+STREAM_CHUNK_CHARS = 16
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The pipelines open many connections at once; the default backlog of 5 stalls them
+    request_queue_size = 256
+
+    def __init__(self, address, latency: float = 0.0, batch_latency: float = 1.0, stream_chunk_delay: float = 0.0,
+                 requests_per_minute: Optional[int] = None, rate_window: float = 60.0, overload_rate: float = 0.0):
+        super().__init__(address, FakeAnthropicHandler)
+        self.latency = latency
+        self.stream_chunk_delay = stream_chunk_delay
+        self.requests_per_minute = requests_per_minute
+        # Shrinking the window (with the limit scaled to match) lets tests exercise rate limiting quickly
+        self.rate_window = rate_window
+        self.overload_rate = overload_rate
+        self.admitted: "deque[float]" = deque()
+        self.rejected = {429: 0, 529: 0}
+        self.batch_latency = batch_latency
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.message_ids = itertools.count()
+        self.batch_ids = itertools.count()
+        self.requests_served = 0
+        self.streams_abandoned = 0
+        self.prompt_cache: set = set()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self) -> Tuple[Optional[int], Dict[str, str]]:
+        """Applies the fake limits to one /v1/messages request. Returns (error status or None, headers)."""
+        with self.lock:
+            now = time.monotonic()
+            while self.admitted and now - self.admitted[0] >= self.rate_window:
+                self.admitted.popleft()
+            if not self.requests_per_minute:
+                status = 529 if self.overload_rate and random.random() < self.overload_rate else None
+                if status:
+                    self.rejected[status] += 1
+                return status, {}
+            allowed = max(1, int(self.requests_per_minute * self.rate_window / 60.0))
+            status = None
+            if len(self.admitted) >= allowed:
+                status = 429
+            elif self.overload_rate and random.random() < self.overload_rate:
+                status = 529
+            else:
+                self.admitted.append(now)
+            if status:
+                self.rejected[status] += 1
+            remaining = allowed - len(self.admitted)
+            reset_in = self.rate_window - (now - self.admitted[0]) if self.admitted else 0.0
+            headers = {
+                "anthropic-ratelimit-requests-limit": str(self.requests_per_minute),
+                "anthropic-ratelimit-requests-remaining": str(int(remaining * 60.0 / self.rate_window)),
+            }
+            if status == 429:
+                headers["retry-after"] = f"{reset_in:.2f}"
+            return status, headers
+
+    def prompt_cache_usage(self, system: Any) -> Tuple[int, int]:
+        """Mimics prompt caching: the longest previously seen prefix ending at a cache breakpoint is read, the rest written."""
+        if not isinstance(system, list):
+            return 0, 0
+        prefix, read, written = "", 0, 0
+        for block in system:
+            prefix += block.get("text", "")
+            if "cache_control" not in block:
+                continue
+            tokens = len(prefix) // 4
+            with self.lock:
+                if prefix in self.prompt_cache:
+                    read, written = tokens, 0
+                else:
+                    self.prompt_cache.add(prefix)
+                    written = tokens - read
+        return read, written
+
+    def make_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            message_id = f"msg_fake_{next(self.message_ids)}"
+            self.requests_served += 1
+        cache_read, cache_creation = self.prompt_cache_usage(params.get("system", ""))
+        prompt_tokens = (len(json.dumps(params.get("system", ""))) + len(json.dumps(params.get("messages", [])))) // 4
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model", "fake"),
+            "content": [{"type": "text", "text": CANNED_TEXT}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": max(prompt_tokens - cache_read - cache_creation, 0), "output_tokens": len(CANNED_TEXT) // 4,
+                      "cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_creation},
+        }
+
+    def batch_view(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        ended = time.time() >= batch["ends_at"]
+        count = len(batch["requests"])
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else count, "succeeded": count if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": batch["created_at"],
+            "expires_at": batch["created_at"],
+            "ended_at": batch["created_at"] if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str, content_type: str = "application/json", headers: Optional[Dict[str, str]] = None):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, message: Dict[str, Any], headers: Dict[str, str]):
+        """Replays `message` as server-sent events, one small text delta at a time."""
+        server: FakeAnthropicServer = self.server
+        text = message["content"][0]["text"]
+        usage = message["usage"]
+        events = [("message_start", {"type": "message_start", "message": {**message, "content": [], "stop_reason": None,
+                                                                          "usage": {**usage, "output_tokens": 1}}}),
+                  ("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})]
+        events += [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                             "delta": {"type": "text_delta", "text": text[i:i + STREAM_CHUNK_CHARS]}})
+                   for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        events += [("content_block_stop", {"type": "content_block_stop", "index": 0}),
+                   ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                      "usage": {"output_tokens": usage["output_tokens"]}}),
+                   ("message_stop", {"type": "message_stop"})]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for name, data in events:
+                self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if name == "content_block_delta" and server.stream_chunk_delay:
+                    time.sleep(server.stream_chunk_delay)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early
+            with server.lock:
+                server.streams_abandoned += 1
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _not_found(self):
+        self._send(404, json.dumps({"type": "error", "error": {"type": "not_found_error", "message": self.path}}))
+
+    def do_POST(self):
+        server: FakeAnthropicServer = self.server
+        path = self.path.split("?")[0]
+        body = self._read_json()
+        if path == "/v1/messages":
+            status, headers = server.admit()
+            if status:
+                error_type = "rate_limit_error" if status == 429 else "overloaded_error"
+                return self._send(status, json.dumps({"type": "error", "error": {"type": error_type, "message": "Injected by the fake server."}}), headers=headers)
+            if server.latency:
+                time.sleep(server.latency)
+            if body.get("stream"):
+                self._stream(server.make_message(body), headers)
+            else:
+                self._send(200, json.dumps(server.make_message(body)), headers=headers)
+        elif path == "/v1/messages/batches":
+            now = time.time()
+            with server.lock:
+                batch_id = f"msgbatch_fake_{next(server.batch_ids)}"
+                batch = {"id": batch_id, "requests": body.get("requests", []), "ends_at": now + server.batch_latency,
+                         "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))}
+                server.batches[batch_id] = batch
+            self._send(200, json.dumps(server.batch_view(batch)))
+        else:
+            self._not_found()
+
+    def do_GET(self):
+        server: FakeAnthropicServer = self.server
+        parts = self.path.split("?")[0].strip("/").split("/")
+        # /v1/messages/batches/{id} and /v1/messages/batches/{id}/results
+        if parts[:3] != ["v1", "messages", "batches"] or len(parts) not in (4, 5):
+            return self._not_found()
+        batch = server.batches.get(parts[3])
+        if batch is None:
+            return self._not_found()
+        if len(parts) == 4:
+            return self._send(200, json.dumps(server.batch_view(batch)))
+        if parts[4] != "results" or time.time() < batch["ends_at"]:
+            return self._not_found()
+        lines = [json.dumps({"custom_id": request["custom_id"],
+                             "result": {"type": "succeeded", "message": server.make_message(request["params"])}})
+                 for request in batch["requests"]]
+        self._send(200, "\n".join(lines) + "\n", content_type="application/binary")
+
+def start_server(port: int = 0, **options) -> FakeAnthropicServer:
+    """Starts the fake server on a background thread; port 0 picks a free port. Options match FakeAnthropicServer."""
+    server = FakeAnthropicServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-anthropic", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering /v1/messages.")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="Seconds before a submitted batch ends.")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.0, help="Seconds between streamed text deltas.")
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="Answer 429 beyond this many requests per minute.")
+    parser.add_argument("--rate-window", type=float, default=60.0, help="Length of the rate-limit window in seconds.")
+    parser.add_argument("--overload-rate", type=float, default=0.0, help="Fraction of requests to fail with 529.")
+    args = parser.parse_args()
+
+    server = FakeAnthropicServer(("127.0.0.1", args.port), latency=args.latency, batch_latency=args.batch_latency,
+                                 stream_chunk_delay=args.stream_chunk_delay, requests_per_minute=args.requests_per_minute,
+                                 rate_window=args.rate_window, overload_rate=args.overload_rate)
+    print(f"Fake Anthropic API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# fake_llm_backend.py
+"""An in-process stand-in for the Anthropic API, for running pipelines offline.
+
+Every agent gets a reply in the JSON shape its prompt asks for, wrapped in a
+<thinking> block like the real model's. Replies, latencies and injected errors
+are seeded from the request, so a run is reproducible regardless of how its
+calls interleave. Install it with:
+
+    BaseAgent.configure_backend(FakeLLMBackend(latency=0.2, jitter=0.1))
+"""
+import anthropic
+import asyncio
+import hashlib
+import httpx
+import json
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from anthropic.types import Message, TextBlock, Usage
+from anthropic.types.messages import MessageBatchErroredResult, MessageBatchSucceededResult
+from json_stream import JSONStreamTracker
+from llm_backend import LLMBackend, LLMResult
+
+if TYPE_CHECKING:
+    from base_agent import BaseAgent
+
+STREAM_CHUNK_CHARS = 16
+
+_CLAUSES = [
+    "the Union must be secured before it can be enlarged",
+    "public credit is the foundation of national strength",
+    "liberty is safest where power is divided and checked",
+    "the people's consent is the only legitimate source of authority",
+    "commerce binds distant interests more firmly than arms",
+    "a republic must not outgrow the virtue of its citizens",
+    "ambition must be made to counteract ambition",
+    "the experience of history is the surest guide to policy",
+]
+
+def _sentences(rng: random.Random, count: int) -> str:
+    return " ".join(f"It follows that {rng.choice(_CLAUSES)}." for _ in range(count))
+
+def _selector(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "core_principle": rng.choice(_CLAUSES).capitalize() + ".",
+        "historical_precedent": {"issue": rng.choice(["The assumption of state debts", "The Louisiana Purchase", "The Jay Treaty"]),
+                                 "position": _sentences(rng, 1)},
+        "allied_thinker": {"name": rng.choice(["John Locke", "Montesquieu", "David Hume", "John Jay"]), "position": _sentences(rng, 1)},
+    }
+
+def _thinker(rng: random.Random) -> Dict[str, Any]:
+    # One reply serves both the simple ("argument") and complex (three arguments) prompts
+    return {"argument": _sentences(rng, 4), "argument_orthodox": _sentences(rng, 4),
+            "argument_unorthodox": _sentences(rng, 4), "argument_pragmatic": _sentences(rng, 4)}
+
+def _arbiter(rng: random.Random) -> Dict[str, Any]:
+    scores = {}
+    for key in ("argument_A", "argument_B"):
+        criteria = {f"{name}_score": rng.randint(5, 10) for name in ("structure", "depth", "support", "rhetoric")}
+        criteria["final_score"] = round(sum(criteria.values()) * 2.5)
+        scores[key] = criteria
+    winner = "Argument A" if scores["argument_A"]["final_score"] >= scores["argument_B"]["final_score"] else "Argument B"
+    return {"scores": scores, "evaluation_summary": _sentences(rng, 1), "winning_argument": winner, "justification": _sentences(rng, 2)}
+
+# Reply generators keyed by agent name, each matching that agent's <output_format> in prompts.yaml
+AGENT_RESPONSES: Dict[str, Callable[[random.Random], Dict[str, Any]]] = {
+    "Selector": _selector,
+    "Thinker": _thinker,
+    "Validator": lambda rng: {"winning_argument_text": _sentences(rng, 4)},
+    "RedTeam": lambda rng: {"original_argument": _sentences(rng, 3),
+                            "critical_vulnerability": {"type": rng.choice(["Internal Flaw", "External Counterargument"]),
+                                                       "description": _sentences(rng, 1), "reasoning": _sentences(rng, 1)}},
+    "Strategist": lambda rng: {"vulnerability_addressed": _sentences(rng, 1),
+                               "strategic_responses": {"direct_rebuttal": _sentences(rng, 3), "reframe_and_minimize": _sentences(rng, 3),
+                                                       "concede_and_outweigh": _sentences(rng, 3)}},
+    "FinalJudge": lambda rng: {"winning_strategy": rng.choice(["Option A: Original Argument", "Option B: Direct Rebuttal",
+                                                               "Option C: Reframe & Minimize", "Option D: Concede & Outweigh"]),
+                               "justification": _sentences(rng, 2), "final_argument_text": _sentences(rng, 5)},
+    "Communicator": lambda rng: {"final_statement": "Gentlemen, " + _sentences(rng, 6)},
+    "Arbiter": _arbiter,
+}
+
+class FakeLLMBackend(LLMBackend):
+    """Schema-valid replies for every agent with simulated latency, jitter and errors.
+
+    - `latency` +/- `jitter` seconds per direct request; `batch_latency` per batch.
+    - `error_rate` of requests fail: direct ones raise a 500 InternalServerError,
+      batched ones come back errored. Direct requests go through the agent's rate
+      limiter when one is configured, which retries them; each retry is a new draw.
+    - Streaming agents get their reply in chunks `stream_chunk_delay` seconds apart.
+    """
+
+    name = "fake LLM backend"
+    cacheable = False
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.1, error_rate: float = 0.0, batch_latency: float = 1.0,
+                 stream_chunk_delay: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.batch_latency = batch_latency
+        self.stream_chunk_delay = stream_chunk_delay
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, int] = {}
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "batches": self.batches}
+
+    def _draw(self, request: Dict[str, Any]) -> random.Random:
+        """A generator seeded by the request and how many times it has been sent before."""
+        key = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+            self.requests += 1
+        return random.Random(f"{key}|{self.seed}|{attempt}")
+
+    def _failed(self, rng: random.Random) -> bool:
+        failed = rng.random() < self.error_rate
+        if failed:
+            with self._lock:
+                self.errors += 1
+        return failed
+
+    @staticmethod
+    def reply_text(agent_name: str, rng: random.Random) -> str:
+        generate = AGENT_RESPONSES.get(agent_name)
+        if generate is None:
+            # Unknown agents get every known field, which still satisfies any of the prompts
+            reply = {}
+            for generator in AGENT_RESPONSES.values():
+                reply.update(generator(rng))
+        else:
+            reply = generate(rng)
+        return f"<thinking>Simulated reasoning for {agent_name}.</thinking>\n{json.dumps(reply, indent=2)}"
+
+    @staticmethod
+    def _usage(request: Dict[str, Any], text: str) -> Usage:
+        prompt = json.dumps(request["system"]) + json.dumps(request["messages"])
+        return Usage(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4,
+                     cache_creation_input_tokens=0, cache_read_input_tokens=0)
+
+    async def _attempt(self, agent: "BaseAgent", request: Dict[str, Any], on_stream_text: Optional[Callable[[str], None]]) -> Tuple[LLMResult, Dict[str, str], int]:
+        """One try at a request. Returns (result, headers, output tokens) like AnthropicBackend's senders."""
+        rng = self._draw(request)
+        started = time.perf_counter()
+        await asyncio.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+        if self._failed(rng):
+            response = httpx.Response(500, request=httpx.Request("POST", "https://fake-llm.invalid/v1/messages"))
+            raise anthropic.InternalServerError("Simulated server error from the fake LLM backend.", response=response, body=None)
+        text = self.reply_text(agent.name, rng)
+        usage = self._usage(request, text)
+        if not agent.streaming:
+            return (text, usage, None, False), {}, usage.output_tokens
+        # The wait above stands in for time to first token
+        first_token_seconds = time.perf_counter() - started
+        tracker = JSONStreamTracker(agent.stream_field, on_stream_text)
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            if self.stream_chunk_delay:
+                await asyncio.sleep(self.stream_chunk_delay)
+            if tracker.feed(text[start:start + STREAM_CHUNK_CHARS]):
+                break
+        text = tracker.text[:tracker.end] if tracker.complete else tracker.text
+        return (text, usage, first_token_seconds, tracker.complete), {}, usage.output_tokens
+
+    async def send(self, agent: "BaseAgent", request: Dict[str, Any], on_stream_text: Optional[Callable[[str], None]] = None) -> LLMResult:
+        """Answers one request, through the agent's shared rate limiter when one is configured."""
+        send = lambda _client: self._attempt(agent, request, on_stream_text)
+        limiter = agent.rate_limiter
+        if limiter is None:
+            result, _, _ = await send(None)
+            return result
+        input_tokens = len(json.dumps(request["system"]) + json.dumps(request["messages"])) // 4
+        return await limiter.call(send, None, input_tokens, request["max_tokens"])
+
+    async def send_batch(self, requests: List[Tuple[str, Dict[str, Any]]], poll_interval: float) -> Dict[str, Any]:
+        with self._lock:
+            self.batches += 1
+        await asyncio.sleep(self.batch_latency)
+        results = {}
+        for custom_id, params in requests:
+            rng = self._draw(params)
+            if self._failed(rng):
+                results[custom_id] = MessageBatchErroredResult.model_construct(type="errored")
+                continue
+            # BatchDispatcher labels each custom_id with the agent's name, e.g. "Thinker-12"
+            text = self.reply_text(custom_id.rsplit("-", 1)[0], rng)
+            message = Message(id=f"msg_fake_{custom_id}", type="message", role="assistant", model=params["model"],
+                              content=[TextBlock(type="text", text=text)], stop_reason="end_turn", stop_sequence=None,
+                              usage=self._usage(params, text))
+            results[custom_id] = MessageBatchSucceededResult(type="succeeded", message=message)
+        return results
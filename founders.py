@@ -0,0 +1,49 @@
+# founders.py
+"""Builds the founder agents every runner and benchmark debates with."""
+import os
+from typing import TYPE_CHECKING, Dict, List
+
+from historical_agent import HistoricalAgent
+from specialist_agents import (CommunicatorAgent, FinalJudgeAgent, RedTeamAgent, ResearcherAgent, SelectorAgent,
+                               StrategistAgent, ThinkerAgent, ValidatorAgent)
+
+if TYPE_CHECKING:
+    from rag_system import RAGSystem
+
+DEFAULT_FOUNDERS = ["Alexander Hamilton", "Thomas Jefferson", "James Madison"]
+
+def load_persona_profile(founder_name: str, corpora_path: str = "corpora") -> str:
+    # Matched case-insensitively: the corpus files are capitalized (Hamilton.txt)
+    wanted = f"{founder_name.split(' ')[-1]}.txt".lower()
+    try:
+        matches = [name for name in sorted(os.listdir(corpora_path)) if name.lower() == wanted]
+    except FileNotFoundError:
+        matches = []
+    if not matches:
+        print(f"ERROR: Persona profile for {founder_name} not found.")
+        return ""
+    with open(os.path.join(corpora_path, matches[0]), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def build_specialist_agents(rag_system: "RAGSystem") -> Dict:
+    """The full set of specialists; the simple pipeline just uses fewer of them."""
+    return {
+        "selector": SelectorAgent(),
+        "researcher": ResearcherAgent(rag_system=rag_system),
+        "thinker": ThinkerAgent(),
+        "validator": ValidatorAgent(),
+        "red_team": RedTeamAgent(),
+        "strategist": StrategistAgent(),
+        "final_judge": FinalJudgeAgent(),
+        "communicator": CommunicatorAgent()
+    }
+
+def build_founder_agents(all_prompts: Dict, specialist_agents: Dict, founders: List[str] = DEFAULT_FOUNDERS,
+                         corpora_path: str = "corpora") -> List[HistoricalAgent]:
+    """One HistoricalAgent per founder whose persona profile was found; the rest are skipped."""
+    agents = []
+    for name in founders:
+        profile = load_persona_profile(name, corpora_path)
+        if profile:
+            agents.append(HistoricalAgent(name=name, persona_profile=profile, all_prompts=all_prompts, specialist_agents=specialist_agents))
+    return agents
@@ -1,14 +1,28 @@
 # historical_agent.py
+import contextvars
 import json
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Literal, Optional
+from checkpoint_store import CheckpointStore
+from pipeline import Pipeline, PipelineRun, Stage, StageFailed
+from tracing import tracer
+
+# The current run's listener for the Communicator's streamed statement. A context
+# variable rather than an agent attribute, because the same agent can be running
+# several topics at once; pipeline stages inherit it from run_pipeline's context.
+_statement_listener: "contextvars.ContextVar[Optional[Callable[[str], None]]]" = contextvars.ContextVar("statement_listener", default=None)
 
 class HistoricalAgent:
+    # Stages that don't depend on each other (e.g. the two retrieval stages) run concurrently
+    max_parallel_stages = 4
+
     def __init__(self, name: str, persona_profile: str, all_prompts: Dict, specialist_agents: Dict):
         self.name = name
         self.persona_profile = persona_profile
         self.all_prompts = all_prompts
         self.specialist_agents = specialist_agents
         self.founder_key = name.split(' ')[-1]
+        # Sent ahead of the system prompt on every persona-aware call and marked for prompt caching
+        self.persona_context = f"<persona_profile>\n{persona_profile}\n</persona_profile>"
 
     def _get_prompts(self, agent_name: str, prompt_type: str) -> (str, str):
         prompts = self.all_prompts[agent_name]
@@ -20,118 +34,150 @@ class HistoricalAgent:
         return system_prompt, user_prompt_template
 
     def _format_user_prompt(self, agent_name: str, template: str, dynamic_vars: Dict = None) -> str:
-        all_vars = self.all_prompts[agent_name][self.founder_key].get('prompt_variables', {})
+        # Copy so per-call variables never leak into the shared prompt config (pipelines may run concurrently)
+        all_vars = dict(self.all_prompts[agent_name][self.founder_key].get('prompt_variables', {}))
         if dynamic_vars:
             all_vars.update(dynamic_vars)
         if all_vars:
             return template.format(**all_vars)
         return template
 
-    def generate_complex_response(self, topic: str, debate_history: str) -> str:
-        print(f"\n--- Running COMPLEX Pipeline for {self.name} ---")
-        
-        # Step 1: Selector
+    def _check(self, output: Dict, label: str) -> Dict:
+        if "error" in output:
+            raise StageFailed(f"({self.name}'s {label} agent failed: {output.get('response', '')})")
+        return output
+
+    # --- Pipeline stages. Each reads its declared inputs and returns its declared outputs. ---
+
+    def _run_selector(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt, user_template = self._get_prompts('SelectorAgent', 'base_user_prompt')
-        user_prompt = self._format_user_prompt('SelectorAgent', user_template, {"topic_variable": topic, "persona_profile_variable": self.persona_profile})
-        selector_output = self.specialist_agents["selector"].run(system_prompt, user_prompt)
-        if "error" in selector_output: return f"({self.name}'s Selector agent failed: {selector_output.get('response', '')})"
-        
-        # Step 2: Researcher
-        research_dossier = self.specialist_agents["researcher"].run(selector_output, topic, self.name)
-
-        # Step 3: Thinker
+        user_prompt = self._format_user_prompt('SelectorAgent', user_template, {"topic_variable": ctx["topic"]})
+        selector_output = self.specialist_agents["selector"].run(system_prompt, user_prompt, cached_context=self.persona_context)
+        return {"selector_output": self._check(selector_output, "Selector")}
+
+    def _run_research_core(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        return {"core_research": self.specialist_agents["researcher"].research_core(ctx["selector_output"], ctx["topic"], self.name)}
+
+    def _run_research_allied(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        return {"allied_research": self.specialist_agents["researcher"].research_allied(ctx["selector_output"], self.name)}
+
+    @staticmethod
+    def _research_dossier(ctx: Dict[str, Any]) -> Dict[str, str]:
+        return {**ctx["core_research"], **ctx["allied_research"]}
+
+    def _run_complex_thinker(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt, user_template = self._get_prompts('ThinkerAgent', 'complex_user_prompt')
         user_prompt = user_template.format(
-            topic_variable=topic,
-            selector_output_json=json.dumps(selector_output, indent=2), 
-            researcher_dossier_text=json.dumps(research_dossier, indent=2), 
-            persona_profile_text=self.persona_profile
+            topic_variable=ctx["topic"],
+            selector_output_json=json.dumps(ctx["selector_output"], indent=2),
+            researcher_dossier_text=json.dumps(self._research_dossier(ctx), indent=2)
         )
-        thinker_output = self.specialist_agents["thinker"].run(system_prompt, user_prompt)
-        if "error" in thinker_output: return f"({self.name}'s Thinker agent failed: {thinker_output.get('response', '')})"
+        thinker_output = self.specialist_agents["thinker"].run(system_prompt, user_prompt, cached_context=self.persona_context)
+        return {"thinker_output": self._check(thinker_output, "Thinker")}
+
+    def _run_simple_thinker(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        system_prompt, user_template = self._get_prompts('ThinkerAgent', 'simple_user_prompt')
+        user_prompt = user_template.format(selector_output_json=json.dumps(ctx["selector_output"], indent=2), researcher_dossier_text=json.dumps(self._research_dossier(ctx), indent=2))
+        thinker_output = self._check(self.specialist_agents["thinker"].run(system_prompt, user_prompt, cached_context=self.persona_context), "simple Thinker")
 
-        # Step 4: Validator
+        # Repackage the Thinker's output for the Communicator
+        argument_text_from_thinker = thinker_output.get("argument", "")
+        return {"communicator_brief": {"final_argument_text": argument_text_from_thinker}}
+
+    def _run_validator(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt, user_template = self._get_prompts('ValidatorAgent', 'base_user_prompt')
-        user_prompt = self._format_user_prompt('ValidatorAgent', user_template, {"thinker_output_json": json.dumps(thinker_output, indent=2), "selector_output_json": json.dumps(selector_output, indent=2), "persona_profile_text": self.persona_profile})
-        validator_output = self.specialist_agents["validator"].run(system_prompt, user_prompt)
-        
-        if "error" in validator_output: return f"({self.name}'s Validator agent failed: {validator_output.get('response', '')})"
-        
+        user_prompt = self._format_user_prompt('ValidatorAgent', user_template, {"thinker_output_json": json.dumps(ctx["thinker_output"], indent=2), "selector_output_json": json.dumps(ctx["selector_output"], indent=2)})
+        validator_output = self._check(self.specialist_agents["validator"].run(system_prompt, user_prompt, cached_context=self.persona_context), "Validator")
+
         # SIMPLIFIED LOGIC: Directly get the text from the simpler JSON
         winning_argument = validator_output.get("winning_argument_text", "")
-        if not winning_argument: return f"({self.name}'s Validator agent failed to select an argument.)"
+        if not winning_argument:
+            raise StageFailed(f"({self.name}'s Validator agent failed to select an argument.)")
+        return {"winning_argument": winning_argument}
 
-        # Step 5: Red Team
+    def _run_red_team(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt, user_template = self._get_prompts('RedTeamAgent', 'base_user_prompt')
-        user_prompt = self._format_user_prompt('RedTeamAgent', user_template, {"validator_winning_argument": winning_argument})
+        user_prompt = self._format_user_prompt('RedTeamAgent', user_template, {"validator_winning_argument": ctx["winning_argument"]})
         red_team_output = self.specialist_agents["red_team"].run(system_prompt, user_prompt)
-        if "error" in red_team_output: return f"({self.name}'s Red Team agent failed: {red_team_output.get('response', '')})"
+        return {"red_team_output": self._check(red_team_output, "Red Team")}
 
-        # Step 6: Strategist
+    def _run_strategist(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt, user_template = self._get_prompts('StrategistAgent', 'base_user_prompt')
-        user_prompt = self._format_user_prompt('StrategistAgent', user_template, {"red_team_output_json": json.dumps(red_team_output, indent=2), "persona_profile_text": self.persona_profile})
-        strategist_output = self.specialist_agents["strategist"].run(system_prompt, user_prompt)
-        if "error" in strategist_output: return f"({self.name}'s Strategist agent failed: {strategist_output.get('response', '')})"
+        user_prompt = self._format_user_prompt('StrategistAgent', user_template, {"red_team_output_json": json.dumps(ctx["red_team_output"], indent=2)})
+        strategist_output = self.specialist_agents["strategist"].run(system_prompt, user_prompt, cached_context=self.persona_context)
+        return {"strategist_output": self._check(strategist_output, "Strategist")}
 
-        # Step 7: Final Judge
+    def _run_final_judge(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt, user_template = self._get_prompts('FinalJudgeAgent', 'user_prompt_template')
-        user_prompt = user_template.format(original_argument_text=winning_argument, strategist_output_json=json.dumps(strategist_output, indent=2))
+        user_prompt = user_template.format(original_argument_text=ctx["winning_argument"], strategist_output_json=json.dumps(ctx["strategist_output"], indent=2))
         final_judge_output = self.specialist_agents["final_judge"].run(system_prompt, user_prompt)
-        if "error" in final_judge_output: return f"({self.name}'s Final Judge agent failed: {final_judge_output.get('response', '')})"
+        # The Communicator reads the judge's output through the same slot as the simple brief
+        return {"communicator_brief": self._check(final_judge_output, "Final Judge")}
 
-        # Step 8: Communicator
+    def _run_communicator(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt, user_template = self._get_prompts('CommunicatorAgent', 'base_user_prompt')
         user_prompt = self._format_user_prompt(
-            'CommunicatorAgent', 
-            user_template, 
+            'CommunicatorAgent',
+            user_template,
             {
-                "final_judge_output_json": json.dumps(final_judge_output, indent=2), 
-                "debate_history_text": debate_history, 
-                "persona_profile_text": self.persona_profile,
-                "topic_variable": topic
+                "final_judge_output_json": json.dumps(ctx["communicator_brief"], indent=2),
+                "debate_history_text": ctx["debate_history"],
+                "topic_variable": ctx["topic"]
             }
         )
-        communicator_output = self.specialist_agents["communicator"].run(system_prompt, user_prompt)
-        if "error" in communicator_output: return f"({self.name}'s Communicator agent failed: {communicator_output.get('response', '')})"
-        
-        return communicator_output.get("final_statement", f"({self.name} could not formulate a final statement.)")
+        communicator_output = self._check(self.specialist_agents["communicator"].run(system_prompt, user_prompt, cached_context=self.persona_context, on_stream_text=_statement_listener.get()), "Communicator")
+        return {"final_statement": communicator_output.get("final_statement", f"({self.name} could not formulate a final statement.)")}
+
+    def run_pipeline(self, model_type: Literal['simple', 'complex'], topic: str, debate_history: str, checkpoint_store: Optional[CheckpointStore] = None,
+                     statement_listener: Optional[Callable[[str], None]] = None) -> PipelineRun:
+        """Runs the simple or complex pipeline DAG, returning the statement plus per-stage wall times.
+
+        With a `checkpoint_store`, stages already completed in that run are skipped.
+        In streaming mode, `statement_listener` receives this run's final statement as it arrives.
+        """
+        print(f"\n--- Running {model_type.upper()} Pipeline for {self.name} ---")
+        pipeline = PIPELINES[model_type]
+        checkpoints = checkpoint_store.scope(self.name, topic, model_type) if checkpoint_store is not None else None
+        token = _statement_listener.set(statement_listener)
+        try:
+            with tracer.span("pipeline", founder=self.name, topic=topic, model_type=model_type) as span:
+                pipeline_run = pipeline.run(self, {"topic": topic, "debate_history": debate_history}, max_workers=self.max_parallel_stages, checkpoints=checkpoints)
+                span.set(failed=pipeline_run.failure is not None, resumed_stages=len(pipeline_run.resumed_stages))
+        finally:
+            _statement_listener.reset(token)
+        if pipeline_run.resumed_stages:
+            print(f"    > Resumed {self.name}'s {', '.join(pipeline_run.resumed_stages)} from checkpoints.")
+        return pipeline_run
+
+    def generate_complex_response(self, topic: str, debate_history: str) -> str:
+        return self.run_pipeline('complex', topic, debate_history).result
 
     def generate_simple_response(self, topic: str, debate_history: str) -> str:
         """Runs the simplified 4-agent pipeline."""
-        print(f"\n--- Running SIMPLE Pipeline for {self.name} ---")
-
-        # Step 1: Selector
-        system_prompt, user_template = self._get_prompts('SelectorAgent', 'base_user_prompt')
-        user_prompt = self._format_user_prompt('SelectorAgent', user_template, {"topic_variable": topic, "persona_profile_variable": self.persona_profile})
-        selector_output = self.specialist_agents["selector"].run(system_prompt, user_prompt)
-        if "error" in selector_output: return f"({self.name}'s Selector agent failed: {selector_output.get('response', '')})"
-
-        # Step 2: Researcher
-        research_dossier = self.specialist_agents["researcher"].run(selector_output, topic, self.name)
-        
-        # Step 3: Thinker (using the simple prompt)
-        system_prompt, user_template = self._get_prompts('ThinkerAgent', 'simple_user_prompt')
-        user_prompt = user_template.format(selector_output_json=json.dumps(selector_output, indent=2), researcher_dossier_text=json.dumps(research_dossier, indent=2), persona_profile_text=self.persona_profile)
-        thinker_output = self.specialist_agents["thinker"].run(system_prompt, user_prompt)
-        if "error" in thinker_output: return f"({self.name}'s simple Thinker agent failed: {thinker_output.get('response', '')})"
-
-        # Repackage the Thinker's output for the Communicator
-        argument_text_from_thinker = thinker_output.get("argument", "")
-        communicator_brief = { "final_argument_text": argument_text_from_thinker }
-
-        # Step 4: Communicator
-        system_prompt, user_template = self._get_prompts('CommunicatorAgent', 'base_user_prompt')
-        user_prompt = self._format_user_prompt(
-            'CommunicatorAgent', 
-            user_template, 
-            {
-                "final_judge_output_json": json.dumps(communicator_brief, indent=2), 
-                "debate_history_text": debate_history, 
-                "persona_profile_text": self.persona_profile,
-                "topic_variable": topic
-            }
-        )
-        communicator_output = self.specialist_agents["communicator"].run(system_prompt, user_prompt)
-        if "error" in communicator_output: return f"({self.name}'s Communicator agent failed: {communicator_output.get('response', '')})"
-
-        return communicator_output.get("final_statement", f"({self.name} could not formulate a final statement.)")
\ No newline at end of file
+        return self.run_pipeline('simple', topic, debate_history).result
+
+_RESEARCH_STAGES = [
+    Stage("selector", inputs=["topic"], outputs=["selector_output"], run=HistoricalAgent._run_selector),
+    Stage("research_core", inputs=["selector_output", "topic"], outputs=["core_research"], run=HistoricalAgent._run_research_core),
+    Stage("research_allied", inputs=["selector_output"], outputs=["allied_research"], run=HistoricalAgent._run_research_allied),
+]
+
+_THINKER_INPUTS = ["topic", "selector_output", "core_research", "allied_research"]
+
+# Selector -> Researcher -> Thinker -> Communicator
+SIMPLE_PIPELINE = Pipeline("simple", _RESEARCH_STAGES + [
+    Stage("thinker", inputs=_THINKER_INPUTS, outputs=["communicator_brief"], run=HistoricalAgent._run_simple_thinker),
+    Stage("communicator", inputs=["communicator_brief", "debate_history", "topic"], outputs=["final_statement"], run=HistoricalAgent._run_communicator),
+], initial_inputs=["topic", "debate_history"], result_key="final_statement")
+
+# Selector -> Researcher -> Thinker -> Validator -> Red Team -> Strategist -> Final Judge -> Communicator
+COMPLEX_PIPELINE = Pipeline("complex", _RESEARCH_STAGES + [
+    Stage("thinker", inputs=_THINKER_INPUTS, outputs=["thinker_output"], run=HistoricalAgent._run_complex_thinker),
+    Stage("validator", inputs=["thinker_output", "selector_output"], outputs=["winning_argument"], run=HistoricalAgent._run_validator),
+    Stage("red_team", inputs=["winning_argument"], outputs=["red_team_output"], run=HistoricalAgent._run_red_team),
+    Stage("strategist", inputs=["red_team_output"], outputs=["strategist_output"], run=HistoricalAgent._run_strategist),
+    Stage("final_judge", inputs=["winning_argument", "strategist_output"], outputs=["communicator_brief"], run=HistoricalAgent._run_final_judge),
+    Stage("communicator", inputs=["communicator_brief", "debate_history", "topic"], outputs=["final_statement"], run=HistoricalAgent._run_communicator),
+], initial_inputs=["topic", "debate_history"], result_key="final_statement")
+
+PIPELINES = {"simple": SIMPLE_PIPELINE, "complex": COMPLEX_PIPELINE}
@@ -0,0 +1,132 @@
+# json_stream.py
+from typing import Callable, Optional
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class JSONStreamTracker:
+    """Follows a streamed response and reports when its top-level JSON object closes.
+
+    Text inside <thinking> blocks is skipped, and braces inside JSON strings are
+    ignored, so `complete` turns True exactly at the object's closing brace.
+    Optionally, the decoded value of one top-level string field is passed to
+    `on_field_text` piece by piece as it arrives.
+    """
+
+    OPEN_TAG = "<thinking>"
+    CLOSE_TAG = "</thinking>"
+
+    def __init__(self, field: Optional[str] = None, on_field_text: Optional[Callable[[str], None]] = None):
+        self.field = field
+        self.on_field_text = on_field_text
+        self.text = ""
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._in_thinking = False
+        self._depth = 0
+        self._in_string = False
+        self._escape: Optional[str] = None
+        # Where we are among the top-level members: key, colon, value or comma
+        self._expect = "key"
+        self._key = ""
+        self._last_key = None
+        self._string_role = None
+        self._field_pieces = []
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    @property
+    def json_text(self) -> Optional[str]:
+        return self.text[self.start:self.end] if self.complete else None
+
+    def feed(self, chunk: str) -> bool:
+        """Consumes the next piece of the response; returns True once the object has closed."""
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text) and not self.complete:
+            if self._depth == 0:
+                tag = self.CLOSE_TAG if self._in_thinking else self.OPEN_TAG
+                if text[self._pos] == "<":
+                    candidate = text[self._pos:self._pos + len(tag)]
+                    if candidate == tag:
+                        self._in_thinking = not self._in_thinking
+                        self._pos += len(tag)
+                        continue
+                    if tag.startswith(candidate):
+                        break # The tag may be split across chunks; wait for more text
+                if not self._in_thinking and text[self._pos] == "{":
+                    self.start = self._pos
+                    self._depth = 1
+                    self._expect = "key"
+                self._pos += 1
+                continue
+            self._consume(text[self._pos])
+            self._pos += 1
+            if self._depth == 0:
+                self.end = self._pos
+        if self._field_pieces:
+            # One callback per chunk rather than per character
+            self.on_field_text("".join(self._field_pieces))
+            self._field_pieces = []
+        return self.complete
+
+    def _consume(self, char: str):
+        if self._in_string:
+            self._consume_string_char(char)
+            return
+        if char == '"':
+            self._in_string = True
+            if self._depth == 1:
+                self._string_role = "key" if self._expect == "key" else "value"
+                self._key = ""
+            else:
+                self._string_role = None
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 1:
+                self._expect = "comma"
+        elif self._depth == 1 and char == ":":
+            self._expect = "value"
+        elif self._depth == 1 and char == ",":
+            self._expect = "key"
+
+    def _consume_string_char(self, char: str):
+        streaming = self._string_role == "value" and self.field is not None and self._last_key == self.field
+        if self._escape is not None:
+            self._escape += char
+            if self._escape.startswith("u"):
+                if len(self._escape) < 5:
+                    return
+                try:
+                    code = int(self._escape[1:], 16)
+                except ValueError:
+                    code = 0
+                # Lone surrogate halves can't be printed; the final parse still decodes them properly
+                decoded = chr(code) if code and not 0xD800 <= code < 0xE000 else ""
+            else:
+                decoded = _ESCAPES.get(self._escape, self._escape)
+            self._escape = None
+            self._string_char(decoded, streaming)
+            return
+        if char == "\\":
+            self._escape = ""
+        elif char == '"':
+            self._in_string = False
+            if self._string_role == "key":
+                self._last_key = self._key
+                self._expect = "colon"
+            elif self._string_role == "value":
+                self._expect = "comma"
+            self._string_role = None
+        else:
+            self._string_char(char, streaming)
+
+    def _string_char(self, decoded: str, streaming: bool):
+        if self._string_role == "key":
+            self._key += decoded
+        elif streaming and self.on_field_text is not None and decoded:
+            self._field_pieces.append(decoded)
@@ -0,0 +1,195 @@
+# lexical_index.py
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Words too common in the corpora and in ResearcherAgent's query templates to tell passages apart
+STOPWORDS = frozenset("""a an and are as at be by for from had has have he his i in is it its of on or s that the their
+them they this to was were what which who will with would writings views details ideas""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+class _Postings:
+    """One author's inverted index in compressed sparse row form.
+
+    Term t's postings are `doc_ids[offsets[t]:offsets[t + 1]]`, each with its
+    precomputed BM25 contribution in `weights`. A query is then a handful of
+    array slices added into one score vector.
+    """
+
+    def __init__(self, terms: Dict[str, int], offsets: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+
+    @classmethod
+    def build(cls, documents: List[str], k1: float, b: float) -> "_Postings":
+        terms: Dict[str, int] = {}
+        term_ids, doc_ids, counts = [], [], []
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc_id, document in enumerate(documents):
+            tokens = tokenize(document)
+            doc_lengths[doc_id] = len(tokens)
+            frequencies: Dict[int, int] = {}
+            for token in tokens:
+                term_id = terms.setdefault(token, len(terms))
+                frequencies[term_id] = frequencies.get(term_id, 0) + 1
+            term_ids.extend(frequencies)
+            doc_ids.extend([doc_id] * len(frequencies))
+            counts.extend(frequencies.values())
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.float32)
+        # Group postings by term; the stable sort keeps each list in document order
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tf = term_ids[order], doc_ids[order], tf[order]
+        document_frequency = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=offsets[1:])
+
+        idf = np.log1p((len(documents) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        average_length = doc_lengths.mean() if len(documents) and doc_lengths.mean() > 0 else 1.0
+        length_norm = k1 * (1 - b + b * doc_lengths[doc_ids] / average_length)
+        weights = (idf[term_ids] * tf * (k1 + 1) / (tf + length_norm)).astype(np.float32)
+        return cls(terms, offsets, doc_ids, weights)
+
+    def scores(self, query: str, doc_count: int) -> np.ndarray:
+        scores = np.zeros(doc_count, dtype=np.float32)
+        for token in set(tokenize(query)):
+            term_id = self.terms.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # A document appears at most once per postings list, so plain fancy-index addition is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+class _AuthorDocuments:
+    def __init__(self, ids: List[str], documents: List[str], sources: List[str]):
+        self.ids = ids
+        self.documents = documents
+        self.sources = sources
+        self.postings: Optional[_Postings] = None
+
+class BM25Index:
+    """Okapi BM25 over each author's chunks, kept alongside the vector backend.
+
+    Postings are rebuilt per author after that author's chunks change, on flush
+    (or the next search, if that comes first). With a persist_directory they are
+    saved next to the vectors.
+    """
+
+    layout = "bm25"
+
+    def __init__(self, collection_name: str, persist_directory: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.directory = os.path.join(persist_directory, f"{collection_name}_bm25") if persist_directory else None
+        self.k1 = k1
+        self.b = b
+        self._partitions: Dict[str, _AuthorDocuments] = {}
+        self._dirty: set = set()
+        if self.directory and os.path.isdir(self.directory):
+            self._load()
+
+    def _paths(self, author: str):
+        stem = os.path.join(self.directory, re.sub(r'[^a-z0-9_-]', '_', author))
+        return stem + ".npz", stem + ".json"
+
+    def _load(self):
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+            arrays_path, _ = self._paths(rows["author"])
+            partition = _AuthorDocuments(rows["ids"], rows["documents"], rows["sources"])
+            with np.load(arrays_path) as arrays:
+                terms = {term: i for i, term in enumerate(rows["terms"])}
+                partition.postings = _Postings(terms, arrays["offsets"], arrays["doc_ids"], arrays["weights"])
+            self._partitions[rows["author"]] = partition
+
+    def reset(self):
+        self._dirty.update(self._partitions)
+        self._partitions = {}
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        by_author: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            by_author.setdefault(metadata["author"], []).append(i)
+        for author, indices in by_author.items():
+            current = self._partitions.get(author) or _AuthorDocuments([], [], [])
+            new_ids = {ids[i] for i in indices}
+            keep = [row for row, row_id in enumerate(current.ids) if row_id not in new_ids]
+            self._partitions[author] = _AuthorDocuments(
+                [current.ids[row] for row in keep] + [ids[i] for i in indices],
+                [current.documents[row] for row in keep] + [documents[i] for i in indices],
+                [current.sources[row] for row in keep] + [metadatas[i]["source"] for i in indices],
+            )
+            self._dirty.add(author)
+
+    def delete_source(self, source: str, author: str):
+        current = self._partitions.get(author)
+        if current is None:
+            return
+        keep = [row for row, row_source in enumerate(current.sources) if row_source != source]
+        self._partitions[author] = _AuthorDocuments([current.ids[row] for row in keep], [current.documents[row] for row in keep],
+                                                    [current.sources[row] for row in keep])
+        self._dirty.add(author)
+
+    def _postings(self, partition: _AuthorDocuments) -> _Postings:
+        if partition.postings is None:
+            partition.postings = _Postings.build(partition.documents, self.k1, self.b)
+        return partition.postings
+
+    def search(self, author: str, queries: List[str], top_k: int) -> List[List[str]]:
+        """Returns the top_k documents by `author` for each query string, best first. Documents
+        sharing no term with the query are never returned."""
+        partition = self._partitions.get(author)
+        if partition is None or not partition.ids:
+            return [[] for _ in queries]
+        postings = self._postings(partition)
+        results = []
+        for query in queries:
+            scores = postings.scores(query, len(partition.ids))
+            k = min(top_k, int(np.count_nonzero(scores)))
+            if k == 0:
+                results.append([])
+                continue
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([partition.documents[i] for i in top])
+        return results
+
+    def flush(self):
+        if not self._dirty:
+            return
+        if not self.directory:
+            for author in self._dirty:
+                if author in self._partitions:
+                    self._postings(self._partitions[author])
+            self._dirty = set()
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for author in sorted(self._dirty):
+            arrays_path, rows_path = self._paths(author)
+            partition = self._partitions.get(author)
+            if partition is None or not partition.ids:
+                for path in (arrays_path, rows_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                continue
+            postings = self._postings(partition)
+            np.savez(arrays_path + ".tmp.npz", offsets=postings.offsets, doc_ids=postings.doc_ids, weights=postings.weights)
+            os.replace(arrays_path + ".tmp.npz", arrays_path)
+            terms = sorted(postings.terms, key=postings.terms.get)
+            with open(rows_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({"author": author, "ids": partition.ids, "documents": partition.documents,
+                           "sources": partition.sources, "terms": terms}, f)
+            os.replace(rows_path + ".tmp", rows_path)
+        self._dirty = set()
@@ -0,0 +1,100 @@
+# llm_backend.py
+import anthropic
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from json_stream import JSONStreamTracker
+from llm_client import get_async_client
+
+if TYPE_CHECKING:
+    from base_agent import BaseAgent
+
+# (text, usage, first-token seconds or None, whether reading stopped at the closing JSON brace)
+LLMResult = Tuple[str, Any, Optional[float], bool]
+
+class LLMBackend(ABC):
+    """Where BaseAgent sends its requests. Requests are Messages API parameter dicts.
+
+    Install a different one with BaseAgent.configure_backend, e.g. FakeLLMBackend
+    to run pipelines offline.
+    """
+
+    # Shown in progress lines: "Contacting <name> for Thinker..."
+    name = "LLM backend"
+    # Whether responses may be stored in (and served from) the response cache
+    cacheable = True
+
+    @abstractmethod
+    async def send(self, agent: "BaseAgent", request: Dict[str, Any], on_stream_text: Optional[Callable[[str], None]] = None) -> LLMResult:
+        """Sends one request on behalf of `agent`, honoring its streaming and rate-limit settings."""
+
+    @abstractmethod
+    async def send_batch(self, requests: List[Tuple[str, Dict[str, Any]]], poll_interval: float) -> Dict[str, Any]:
+        """Runs (custom_id, request) pairs as one batch, waits for it to end and returns a
+        MessageBatchResult per custom_id. Requests missing from the results count as failed.
+        """
+
+class AnthropicBackend(LLMBackend):
+    """The Anthropic Messages and Message Batches APIs on the shared async client."""
+
+    name = "Anthropic API"
+
+    async def _create_response(self, client: anthropic.AsyncAnthropic, request: Dict[str, Any]) -> Tuple[LLMResult, Any, int]:
+        """Sends one whole-response request. Returns ((text, usage, None, False), headers, output tokens)."""
+        raw = await client.messages.with_raw_response.create(**request)
+        message = raw.parse()
+        return (message.content[0].text, message.usage, None, False), raw.headers, message.usage.output_tokens
+
+    async def _stream_response(self, client: anthropic.AsyncAnthropic, request: Dict[str, Any], stream_field: Optional[str],
+                               on_stream_text: Optional[Callable[[str], None]]) -> Tuple[LLMResult, Any, int]:
+        """Streams one request, stopping once the JSON object closes.
+
+        Returns ((text, usage, first-token seconds, stopped at JSON), headers, output tokens).
+        """
+        tracker = JSONStreamTracker(stream_field, on_stream_text)
+        started = time.perf_counter()
+        first_token_seconds = None
+        async with client.messages.stream(**request) as stream:
+            async for text in stream.text_stream:
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                if tracker.feed(text):
+                    # Leaving the context closes the connection, so nothing after the object is generated
+                    break
+            usage = stream.current_message_snapshot.usage
+            headers = stream.response.headers
+        text = tracker.text[:tracker.end] if tracker.complete else tracker.text
+        return (text, usage, first_token_seconds, tracker.complete), headers, usage.output_tokens
+
+    async def send(self, agent: "BaseAgent", request: Dict[str, Any], on_stream_text: Optional[Callable[[str], None]] = None) -> LLMResult:
+        """Sends one request, streamed or not, through the agent's shared rate limiter when one is configured."""
+        if agent.streaming:
+            send = lambda client: self._stream_response(client, request, agent.stream_field, on_stream_text)
+        else:
+            send = lambda client: self._create_response(client, request)
+        limiter = agent.rate_limiter
+        if limiter is None:
+            result, _, _ = await send(get_async_client())
+            return result
+        # Rough count for the input-token budget; the API's headers correct the bucket afterwards
+        input_tokens = len(json.dumps(request["system"]) + json.dumps(request["messages"])) // 4
+        return await limiter.call(send, get_async_client(), input_tokens, request["max_tokens"])
+
+    async def send_batch(self, requests: List[Tuple[str, Dict[str, Any]]], poll_interval: float) -> Dict[str, Any]:
+        client = get_async_client()
+        message_batch = await client.messages.batches.create(
+            requests=[{"custom_id": custom_id, "params": params} for custom_id, params in requests]
+        )
+        print(f"    > Submitted batch {message_batch.id} with {len(requests)} requests; polling every {poll_interval:g}s...")
+        while message_batch.processing_status != "ended":
+            await asyncio.sleep(poll_interval)
+            message_batch = await client.messages.batches.retrieve(message_batch.id)
+        print(f"    > Batch {message_batch.id} ended: {message_batch.request_counts.succeeded} succeeded, "
+              f"{message_batch.request_counts.errored} errored.")
+        # Results can come back in any order; custom_id ties each one to its request
+        results = {}
+        async for entry in await client.messages.batches.results(message_batch.id):
+            results[entry.custom_id] = entry.result
+        return results
@@ -0,0 +1,60 @@
+# llm_client.py
+import anthropic
+import asyncio
+import httpx
+import threading
+import weakref
+from typing import Any, Coroutine, Optional
+
+# Connection pool shared by every agent's calls on a given event loop
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, anthropic.AsyncAnthropic]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+def get_async_client() -> anthropic.AsyncAnthropic:
+    """Returns the AsyncAnthropic client shared by all agents on the running event loop.
+
+    httpx connection pools are bound to the loop that created them, so one client
+    is kept per loop rather than one per agent.
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            http_client = anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+            )
+            client = anthropic.AsyncAnthropic(http_client=http_client)
+            _clients[loop] = client
+    return client
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True)
+            thread.start()
+            _background_loop = loop
+    return _background_loop
+
+def run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Runs a coroutine on the process-wide LLM event loop and blocks until it finishes.
+
+    This is what the synchronous agent API uses, so sync callers on any thread
+    share the same client and connection pool as async callers on that loop.
+    """
+    loop = _get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the LLM event loop; await the async API instead.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
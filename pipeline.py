@@ -0,0 +1,125 @@
+# pipeline.py
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from tracing import tracer
+
+class StageFailed(Exception):
+    """Raised by a stage to stop its pipeline. The message becomes the pipeline's result."""
+
+class Stage:
+    """One named step of a pipeline: reads `inputs` from the shared context and returns `outputs`."""
+
+    def __init__(self, name: str, inputs: Iterable[str], outputs: Iterable[str], run: Callable[[Any, Dict[str, Any]], Dict[str, Any]]):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.run = run
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+class PipelineRun:
+    """The outcome of one pipeline execution."""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.context: Dict[str, Any] = {}
+        self.stage_timings: Dict[str, float] = {}
+        self.failure: Optional[str] = None
+        self.result: Any = None
+        self.wall_time = 0.0
+        # Stages whose outputs came from a checkpoint instead of being recomputed
+        self.resumed_stages: List[str] = []
+
+class Pipeline:
+    """A DAG of stages wired together by the context keys they read and write.
+
+    The scheduler starts every stage whose inputs are available, so stages that don't
+    depend on each other run at the same time.
+    """
+
+    def __init__(self, name: str, stages: List[Stage], initial_inputs: Iterable[str], result_key: str):
+        self.name = name
+        self.stages = stages
+        self.initial_inputs = tuple(initial_inputs)
+        self.result_key = result_key
+        self._validate()
+
+    def _validate(self):
+        produced = set(self.initial_inputs)
+        names = set()
+        remaining = list(self.stages)
+        for stage in self.stages:
+            if stage.name in names:
+                raise ValueError(f"Pipeline '{self.name}' has two stages named '{stage.name}'.")
+            names.add(stage.name)
+        # Peel off stages in dependency order; anything left over is unsatisfiable or cyclic
+        while remaining:
+            ready = [stage for stage in remaining if set(stage.inputs) <= produced]
+            if not ready:
+                missing = {stage.name: sorted(set(stage.inputs) - produced) for stage in remaining}
+                raise ValueError(f"Pipeline '{self.name}' has stages whose inputs are never produced: {missing}")
+            for stage in ready:
+                produced.update(stage.outputs)
+                remaining.remove(stage)
+        if self.result_key not in produced:
+            raise ValueError(f"Pipeline '{self.name}' never produces its result '{self.result_key}'.")
+
+    def run(self, target: Any, initial_context: Dict[str, Any], max_workers: int = 4, checkpoints: Optional[Any] = None) -> PipelineRun:
+        """Executes every stage against `target`, returning the result, per-stage wall times and any failure.
+
+        With `checkpoints` (anything with load(stage, inputs) and save(stage, inputs, outputs),
+        e.g. a StageCheckpoints), stages that already finished with the same inputs are
+        restored instead of run, and every newly completed stage is saved.
+        """
+        run = PipelineRun(self.name)
+        run.context = dict(initial_context)
+        pending = list(self.stages)
+        started = time.perf_counter()
+
+        def execute(stage: Stage, inputs: Dict[str, Any]):
+            stage_started = time.perf_counter()
+            try:
+                with tracer.span("stage", stage=stage.name, pipeline=self.name) as span:
+                    if checkpoints is not None:
+                        saved = checkpoints.load(stage.name, inputs)
+                        if saved is not None:
+                            run.resumed_stages.append(stage.name)
+                            span.set(resumed=True)
+                            return saved
+                    return stage.run(target, inputs)
+            finally:
+                run.stage_timings[stage.name] = time.perf_counter() - stage_started
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{self.name}-stage") as executor:
+            in_flight = {}
+            while (pending or in_flight) and run.failure is None:
+                for stage in [stage for stage in pending if all(key in run.context for key in stage.inputs)]:
+                    pending.remove(stage)
+                    inputs = {key: run.context[key] for key in stage.inputs}
+                    # Each stage runs in a copy of the caller's context, so its trace spans nest under the caller's
+                    in_flight[executor.submit(contextvars.copy_context().run, execute, stage, inputs)] = (stage, inputs)
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, inputs = in_flight.pop(future)
+                    try:
+                        outputs = future.result()
+                    except StageFailed as e:
+                        run.failure = str(e)
+                        continue
+                    missing = set(stage.outputs) - set(outputs)
+                    if missing:
+                        run.failure = f"(Stage '{stage.name}' did not produce {sorted(missing)}.)"
+                        continue
+                    outputs = {key: outputs[key] for key in stage.outputs}
+                    if checkpoints is not None and stage.name not in run.resumed_stages:
+                        checkpoints.save(stage.name, inputs, outputs)
+                    run.context.update(outputs)
+            # Let anything still running finish before reporting, so timings are complete
+            wait(in_flight)
+
+        run.wall_time = time.perf_counter() - started
+        run.result = run.failure if run.failure is not None else run.context[self.result_key]
+        return run
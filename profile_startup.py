@@ -0,0 +1,66 @@
+# profile_startup.py
+"""Reports the import-time cost of each entry point against the Anthropic client alone.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, so the
+numbers are true cold-start costs. Example:
+
+    python profile_startup.py --top 8
+"""
+import argparse
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ENTRY_POINTS = ["anthropic", "run_analysis", "run_simple_model", "run_complex_model"]
+
+def profile_import(module: str) -> Tuple[float, float, List[Tuple[str, float]]]:
+    """Returns (wall seconds, total import seconds, [(package, seconds spent importing it), ...])."""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+
+    # Lines look like "import time:  self [us] | cumulative | imported package".
+    # Summing each line's self time under its root package attributes every
+    # microsecond exactly once.
+    by_package: Dict[str, float] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        by_package[package] = by_package.get(package, 0.0) + int(self_us) / 1e6
+    ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+    return wall, sum(by_package.values()), ranked
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=5, help="Heaviest packages to list per module.")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        try:
+            results[module] = profile_import(module)
+        except RuntimeError as e:
+            print(f"ERROR: {e}")
+
+    baseline = results.get("anthropic", (None, None, []))[1]
+    print(f"\n{'module':<20} {'wall':>8} {'imports':>9} {'vs anthropic':>13}")
+    for module, (wall, total, _) in results.items():
+        relative = f"{total / baseline:.1f}x" if baseline else "n/a"
+        print(f"{module:<20} {wall:>7.2f}s {total:>8.2f}s {relative:>13}")
+
+    for module, (_, _, ranked) in results.items():
+        print(f"\n{module}: heaviest packages")
+        for package, seconds in ranked[:args.top]:
+            print(f"  {package:<28} {seconds * 1000:>8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,438 @@
 # rag_system.py
-import chromadb
-from sentence_transformers import SentenceTransformer
+import hashlib
+import json
+import numpy as np
 import os
 import re
-from typing import List
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+from chunking import Chunk, TokenChunker, approximate_token_counts, tokenizer_token_counts
+from lexical_index import BM25Index, tokenize
+from response_cache import MemoryLRUCache
+from retrieval_backends import RetrievalBackend, create_backend
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+# One SentenceTransformer per model name for the whole process, loaded on first use
+_embedding_models: Dict[str, "SentenceTransformer"] = {}
+_embedding_models_lock = threading.Lock()
+
+def get_embedding_model(model_name: str) -> "SentenceTransformer":
+    """Returns the process-wide SentenceTransformer for `model_name`, importing and loading it on first call."""
+    with _embedding_models_lock:
+        if model_name not in _embedding_models:
+            # Deferred: importing sentence_transformers pulls in torch
+            from sentence_transformers import SentenceTransformer
+            _embedding_models[model_name] = SentenceTransformer(model_name)
+            print(" -> SentenceTransformer model loaded successfully.")
+        return _embedding_models[model_name]
+
+_cross_encoders: Dict[str, object] = {}
+
+def get_cross_encoder(model_name: str):
+    """Returns the process-wide CrossEncoder for `model_name`, importing and loading it on first call."""
+    with _embedding_models_lock:
+        if model_name not in _cross_encoders:
+            from sentence_transformers import CrossEncoder
+            _cross_encoders[model_name] = CrossEncoder(model_name)
+            print(" -> CrossEncoder reranker loaded successfully.")
+        return _cross_encoders[model_name]
+
+# A phrase in single or double quotes, as ResearcherAgent wraps its topic, principle and precedent.
+# Apostrophes inside words ("Jefferson's") neither open nor close one.
+_QUOTED_PHRASE = re.compile(r"""(?<!\w)(['"])(.+?)\1(?!\w)""")
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Merges ranked document lists by summing 1 / (k + rank) per list; ties keep first-seen order."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            scores[document] = scores.get(document, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
 
 class RAGSystem:
     """Manages loading, chunking, embedding, and retrieving documents."""
-    
-    def __init__(self, corpora_path: str, collection_name: str = "founding_fathers"):
+
+    # Below this many chunks, spinning up encoder processes costs more than it saves
+    MULTIPROCESS_MIN_CHUNKS = 2000
+    # Chunks are embedded and stored this many at a time, bounding memory on large corpora
+    INDEX_WINDOW_CHUNKS = 8192
+
+    def __init__(self, corpora_path: str, collection_name: str = "founding_fathers",
+                 persist_directory: Optional[str] = None, embedding_model_name: str = 'all-MiniLM-L6-v2',
+                 encode_batch_size: int = 64, encode_workers: Optional[int] = None,
+                 partition_by_author: bool = False, backend: Union[str, RetrievalBackend] = "chroma",
+                 chunk_tokens: int = 200, chunk_overlap_tokens: int = 40, min_chunk_tokens: int = 50,
+                 hybrid: bool = True, fusion_candidates: int = 20, rrf_k: int = 60, rerank: Optional[str] = None,
+                 rerank_candidates: int = 10, rerank_model_name: str = 'cross-encoder/ms-marco-MiniLM-L-6-v2'):
         print("Initializing RAG System...")
-        # 1. Initialize embedding model and vector database client
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        print(" -> SentenceTransformer model loaded successfully.")
-        self.client = chromadb.Client()
-        
-        # Clear any old collection to start fresh
-        if collection_name in [c.name for c in self.client.list_collections()]:
-            self.client.delete_collection(name=collection_name)
-        
-        self.collection = self.client.create_collection(name=collection_name)
-        
-        # 2. Process and embed the documents
-        self._build_knowledge_base(corpora_path)
+        if rerank not in (None, "phrase", "cross-encoder"):
+            raise ValueError(f"Unknown rerank mode '{rerank}'. Expected None, 'phrase' or 'cross-encoder'.")
+        # Hybrid queries fuse the top `fusion_candidates` dense and BM25 results by reciprocal rank;
+        # `rerank` then reorders the fused top `rerank_candidates`
+        self.hybrid = hybrid
+        self.fusion_candidates = fusion_candidates
+        self.rrf_k = rrf_k
+        self.rerank = rerank
+        self.rerank_candidates = rerank_candidates
+        self.rerank_model_name = rerank_model_name
+        # Sizes are in the embedding model's tokenizer tokens; the tokenizer is attached on first use
+        self.chunker = TokenChunker(chunk_tokens=chunk_tokens, overlap_tokens=chunk_overlap_tokens, min_chunk_tokens=min_chunk_tokens)
+        self._chunker_ready = False
+        self.encode_batch_size = encode_batch_size
+        # None picks a worker count automatically based on CPU count and corpus size
+        self.encode_workers = encode_workers
+        self.build_stats: Dict = {}
+        self.embedding_model_name = embedding_model_name
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self._embedding_model = None
+        # Repeated query strings skip the SentenceTransformer forward pass
+        self.query_embedding_cache = MemoryLRUCache(max_entries=2048)
+        # Identifies the indexed content; changes whenever a corpus file, the model or the layout does
+        self.index_version = ""
+
+        # 1. Initialize the retrieval backend (the embedding model loads on first use).
+        # partition_by_author keeps one Chroma collection per author so a query never
+        # scans other authors' vectors; the numpy backend is always partitioned.
+        if persist_directory:
+            os.makedirs(persist_directory, exist_ok=True)
+        if isinstance(backend, str):
+            backend = create_backend(backend, collection_name, persist_directory, partition_by_author=partition_by_author)
+        self.backend = backend
+        # Always kept in step with the vectors, so hybrid retrieval can be switched on without a rebuild
+        self.lexical_index = BM25Index(collection_name, persist_directory)
+
+        if persist_directory:
+            # Persistent mode: reopen the on-disk index and only re-embed what changed
+            self._sync_knowledge_base(corpora_path)
+        else:
+            # Clear any old collections to start fresh
+            self.backend.reset()
+            self.lexical_index.reset()
+
+            # 2. Process and embed the documents
+            self._build_knowledge_base(corpora_path)
+        self.backend.flush()
+        self.lexical_index.flush()
         print("RAG System successfully built.")
 
-# Inside RAGSystem class in rag_system.py
+    @property
+    def embedding_model(self) -> "SentenceTransformer":
+        # Loaded lazily so a warm start against an unchanged persistent index never pays for it
+        if self._embedding_model is None:
+            self._embedding_model = get_embedding_model(self.embedding_model_name)
+        return self._embedding_model
+
+    def _delete_source(self, filename: str):
+        """Removes every chunk that came from `filename`."""
+        self.backend.delete_source(filename, os.path.splitext(filename)[0].lower())
+        self.lexical_index.delete_source(filename, os.path.splitext(filename)[0].lower())
+
+    def _prepare_chunker(self):
+        """Counts chunk sizes with the embedding model's tokenizer, capped at its sequence limit."""
+        if self._chunker_ready:
+            return
+        tokenizer = getattr(self.embedding_model, "tokenizer", None)
+        self.chunker.count_tokens = tokenizer_token_counts(tokenizer) if tokenizer is not None else approximate_token_counts
+        self._cap_chunk_tokens(getattr(self.embedding_model, "max_seq_length", None))
+        self._chunker_ready = True
 
-    def _load_and_chunk_document(self, filepath: str) -> List[str]:
-        """Loads a document and splits it into chunks based on paragraphs."""
+    def _cap_chunk_tokens(self, max_seq_length: Optional[int]):
+        """Shrinks chunk_tokens to fit the model's sequence limit. Runs before the chunker's signature is read."""
+        if max_seq_length and self.chunker.chunk_tokens > max_seq_length - 2:
+            # [CLS] and [SEP] take two positions; anything past the limit would be truncated away
+            print(f"    WARN: chunk_tokens {self.chunker.chunk_tokens} exceeds {self.embedding_model_name}'s limit; using {max_seq_length - 2}.")
+            self.chunker.chunk_tokens = max_seq_length - 2
+            self.chunker.overlap_tokens = min(self.chunker.overlap_tokens, self.chunker.chunk_tokens // 2)
+
+    def _load_and_chunk_document(self, filepath: str) -> Iterator[Chunk]:
+        """Streams a document's chunks: whole sentences packed to the chunker's token budget, with overlap."""
         print(f"  - Processing file: {filepath}")
-        with open(filepath, 'r', encoding='utf-8') as f:
-            text = f.read()
+        self._prepare_chunker()
+        return self.chunker.chunk_file(filepath)
+
+    @staticmethod
+    def _hash_file(filepath: str) -> str:
+        """Returns the SHA-256 content hash of a corpus file."""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _corpus_files(self, corpora_path: str) -> Dict[str, str]:
+        """Maps each .txt filename in the corpora path to its full path."""
+        return {
+            filename: os.path.join(corpora_path, filename)
+            for filename in sorted(os.listdir(corpora_path))
+            if filename.endswith(".txt")
+        }
+
+    def _iter_chunks(self, files: List[Tuple[str, str, str]], chunk_counts: Dict[str, int]) -> Iterator[Tuple[str, Dict, str]]:
+        """Yields (document, metadata, id) for every chunk of every (filename, filepath, content_hash), counting chunks per file."""
+        for filename, filepath, content_hash in files:
+            # Authors are keyed in lower case to match the keys ResearcherAgent queries with
+            author_name = os.path.splitext(filename)[0].lower()
+            chunk_counts[filename] = 0
+            for i, chunk in enumerate(self._load_and_chunk_document(filepath)):
+                chunk_counts[filename] += 1
+                # IDs are derived from the file's content hash so they stay unique and
+                # stable across incremental updates. Byte offsets locate the chunk in the file.
+                metadata = {"author": author_name, "source": filename, "start_byte": chunk.start_byte,
+                            "end_byte": chunk.end_byte, "token_count": chunk.token_count}
+                yield chunk.text, metadata, f"{author_name}_{content_hash[:12]}_{i}"
+            print(f"  - Extracted {chunk_counts[filename]} chunks from {filepath}.")
+            if not chunk_counts[filename]:
+                print(f"  - No valid chunks found for {filename}.")
+
+    def _encode_worker_count(self, chunk_count: int) -> int:
+        if self.encode_workers is not None:
+            return self.encode_workers
+        return min(os.cpu_count() or 1, 4) if chunk_count >= self.MULTIPROCESS_MIN_CHUNKS else 1
 
-        # Split the text by double newlines (common paragraph separator)
-        chunks = text.split('\n\n')
+    def _encode_chunks(self, chunks: List[str], pool: Optional[Dict] = None) -> np.ndarray:
+        """Encodes chunks in length-sorted batches so each batch pads to similar lengths, on `pool`'s
+        worker processes if one is given."""
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]))
+        sorted_chunks = [chunks[i] for i in order]
 
-        # Filter out very small or empty chunks
-        min_chunk_size = 100 # Adjust this number if needed
-        valid_chunks = [chunk.strip() for chunk in chunks if len(chunk.strip()) > min_chunk_size]
+        if pool is not None and len(sorted_chunks) > self.encode_batch_size:
+            sorted_embeddings = self.embedding_model.encode_multi_process(
+                sorted_chunks, pool, batch_size=self.encode_batch_size
+            )
+        else:
+            batches = [
+                self.embedding_model.encode(sorted_chunks[i:i + self.encode_batch_size], batch_size=self.encode_batch_size)
+                for i in range(0, len(sorted_chunks), self.encode_batch_size)
+            ]
+            sorted_embeddings = np.concatenate(batches)
 
-        print(f"  - Extracted {len(valid_chunks)} valid chunks from {filepath}.")
-        return valid_chunks
+        # Restore the original chunk order
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+
+    def _index_files(self, files: List[Tuple[str, str, str]]) -> Dict[str, int]:
+        """Chunks, embeds and stores the given files in bulk. Returns the chunk count per file."""
+        if not files:
+            return {}
+        started = time.perf_counter()
+        chunk_counts: Dict[str, int] = {}
+        chunks = self._iter_chunks(files, chunk_counts)
+        total = 0
+        pool = None
+        try:
+            while True:
+                # Encoding still batches across files, one window of chunks at a time
+                window = [chunk for _, chunk in zip(range(self.INDEX_WINDOW_CHUNKS), chunks)]
+                if not window:
+                    break
+                if pool is None:
+                    workers = self._encode_worker_count(len(window))
+                    if workers > 1 and len(window) > self.encode_batch_size:
+                        # Started once, on the first window big enough to need it, and reused by the rest of the build
+                        pool = self.embedding_model.start_multi_process_pool(target_devices=["cpu"] * workers)
+                documents, metadatas, ids = (list(column) for column in zip(*window))
+                self.backend.upsert(ids, self._encode_chunks(documents, pool), documents, metadatas)
+                self.lexical_index.upsert(ids, documents, metadatas)
+                total += len(window)
+        finally:
+            if pool is not None:
+                self.embedding_model.stop_multi_process_pool(pool)
+
+        elapsed = time.perf_counter() - started
+        peak_mb = _peak_rss_mb()
+        self.build_stats = {
+            "files": len(files),
+            "chunks": total,
+            "seconds": elapsed,
+            "chunks_per_second": total / elapsed if elapsed > 0 else 0.0,
+            "peak_memory_mb": peak_mb,
+        }
+        peak_text = f"{peak_mb:.0f} MB" if peak_mb is not None else "n/a"
+        print(f"  - Embedded {total} chunks from {len(files)} files in {elapsed:.2f}s "
+              f"({self.build_stats['chunks_per_second']:.1f} chunks/sec, peak memory {peak_text}).")
+        return chunk_counts
 
     def _build_knowledge_base(self, corpora_path: str):
         """Loads all documents from the corpora path and embeds them."""
-        doc_id_counter = 0
-        for filename in os.listdir(corpora_path):
-            if filename.endswith(".txt"):
-                filepath = os.path.join(corpora_path, filename)
-                author_name = os.path.splitext(filename)[0]
-                
-                # Use our custom chunking logic
-                chunks = self._load_and_chunk_document(filepath)
-                
-                if not chunks:
-                    print(f"  - No valid chunks found for {filename}.")
-                    continue
-
-                # Embed and store the chunks with metadata
-                embeddings = self.embedding_model.encode(chunks)
-                metadata = [{"author": author_name} for _ in chunks]
-                ids = [f"{author_name}_{doc_id_counter + i}" for i in range(len(chunks))]
-                
-                self.collection.add(
-                    embeddings=embeddings,
-                    documents=chunks,
-                    metadatas=metadata,
-                    ids=ids
-                )
-                doc_id_counter += len(chunks)
+        self._prepare_chunker()
+        files = [(filename, filepath, self._hash_file(filepath)) for filename, filepath in self._corpus_files(corpora_path).items()]
+        self._index_files(files)
+        self._set_index_version({filename: content_hash for filename, _, content_hash in files})
+
+    def _set_index_version(self, file_hashes: Dict[str, str]):
+        # Retrieval settings are included too: they change what a query returns for the same content
+        retrieval = {"hybrid": self.hybrid, "fusion_candidates": self.fusion_candidates, "rrf_k": self.rrf_k,
+                     "rerank": self.rerank, "rerank_candidates": self.rerank_candidates}
+        fingerprint = json.dumps({"model": self.embedding_model_name, "layout": self._layout(), "chunking": self.chunker.signature,
+                                  "retrieval": retrieval, "files": file_hashes}, sort_keys=True)
+        self.index_version = hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+    def _layout(self) -> str:
+        return f"{self.backend.layout}+{self.lexical_index.layout}"
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.persist_directory, f"{self.collection_name}_manifest.json")
+
+    def _load_manifest(self) -> Dict:
+        manifest_path = self._manifest_path()
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"  WARN: Could not read index manifest ({e}); rebuilding the index.")
+            return {}
+
+    def _save_manifest(self, manifest: Dict):
+        # Persist the vectors first so the manifest never claims more than is on disk
+        self.backend.flush()
+        self.lexical_index.flush()
+        manifest_path = self._manifest_path()
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def _sync_knowledge_base(self, corpora_path: str):
+        """Brings the persistent index in line with the corpora, touching only added, changed or deleted files."""
+        manifest = self._load_manifest()
+        if manifest.get("embedding_model") == self.embedding_model_name and "max_seq_length" in manifest:
+            # The model's limit was recorded when the index was built, so a warm start can cap without loading it
+            self._cap_chunk_tokens(manifest["max_seq_length"])
+        else:
+            self._prepare_chunker()
+        layout = self._layout()
+        chunking = self.chunker.signature
+        if (manifest.get("embedding_model") != self.embedding_model_name or manifest.get("layout") != layout
+                or manifest.get("chunking") != chunking):
+            # Vectors from a different model are not comparable, and a layout or chunking
+            # change moves every chunk; either way start over
+            if manifest:
+                print(f"  - Index settings changed ({self.embedding_model_name}, {layout}, {chunking}); re-embedding all files.")
+            self.backend.reset()
+            self.lexical_index.reset()
+            manifest = {"embedding_model": self.embedding_model_name, "layout": layout, "chunking": chunking, "files": {}}
+        if "max_seq_length" not in manifest:
+            manifest["max_seq_length"] = getattr(self.embedding_model, "max_seq_length", None)
+
+        indexed_files = manifest["files"]
+        current_files = self._corpus_files(corpora_path)
+
+        for filename in sorted(set(indexed_files) - set(current_files)):
+            print(f"  - Removing deleted file from index: {filename}")
+            self._delete_source(filename)
+            del indexed_files[filename]
+            self._save_manifest(manifest)
+
+        unchanged = 0
+        pending = []
+        for filename, filepath in current_files.items():
+            content_hash = self._hash_file(filepath)
+            previous = indexed_files.get(filename)
+            if previous and previous["sha256"] == content_hash:
+                unchanged += 1
+                continue
+            if previous:
+                print(f"  - File changed, re-indexing: {filename}")
+                self._delete_source(filename)
+            pending.append((filename, filepath, content_hash))
+
+        chunk_counts = self._index_files(pending)
+        for filename, _, content_hash in pending:
+            indexed_files[filename] = {"sha256": content_hash, "chunks": chunk_counts[filename]}
+
+        self._save_manifest(manifest)
+        self._set_index_version({filename: entry["sha256"] for filename, entry in indexed_files.items()})
+        print(f"  - {unchanged} of {len(current_files)} corpus files unchanged; loaded from {self.persist_directory}.")
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        # MiniLM's tokenizer is uncased and ignores runs of whitespace, so these
+        # variants embed identically and can share cache entries
+        return " ".join(text.split()).lower()
+
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Embeds query strings, running the model only on strings not seen before."""
+        keys = [(self.embedding_model_name, self.normalize_query(text)) for text in texts]
+        vectors = [self.query_embedding_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.embedding_model.encode([texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                self.query_embedding_cache.set(keys[i], vector)
+                vectors[i] = vector
+        return np.vstack(vectors)
 
     def query(self, topic: str, author: str, top_k: int = 3) -> str:
         """Searches the knowledge base for relevant passages for a specific author."""
-        query_embedding = self.embedding_model.encode([topic])
-        
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=top_k,
-            where={"author": author} # Filter results by author
-        )
-        
-        retrieved_chunks = results['documents'][0] if results['documents'] else []
-        return "\n---\n".join(retrieved_chunks)
\ No newline at end of file
+        return self.query_many([(topic, author, top_k)])[0]
+
+    def query_many(self, requests: List[Tuple[str, str, int]]) -> List[str]:
+        """Answers several (topic, author, top_k) queries with a single embedding pass.
+
+        Queries for the same author share one filtered search. Results come back in
+        the same order as `requests`.
+        """
+        if not requests:
+            return []
+        with tracer.span("retrieval", queries=len(requests)) as span:
+            query_embeddings = self._encode_queries([topic for topic, _, _ in requests])
+
+            by_author: Dict[str, List[int]] = {}
+            for i, (_, author, _) in enumerate(requests):
+                by_author.setdefault(author, []).append(i)
+            span.set(authors=len(by_author), hybrid=self.hybrid, rerank=self.rerank)
+
+            retrieved: List[str] = [""] * len(requests)
+            for author, indices in by_author.items():
+                top_k = max(requests[i][2] for i in indices)
+                depth = max(top_k, self.fusion_candidates) if self.hybrid else top_k
+                candidates = self.backend.search(author, query_embeddings[indices], depth)
+                if self.hybrid:
+                    lexical = self.lexical_index.search(author, [requests[i][0] for i in indices], depth)
+                    candidates = [reciprocal_rank_fusion([dense, matches], self.rrf_k) for dense, matches in zip(candidates, lexical)]
+                for i, retrieved_chunks in zip(indices, candidates):
+                    if self.rerank:
+                        retrieved_chunks = self._rerank(requests[i][0], retrieved_chunks[:max(self.rerank_candidates, requests[i][2])])
+                    retrieved[i] = "\n---\n".join(retrieved_chunks[:requests[i][2]])
+            return retrieved
+
+    def _rerank(self, query: str, documents: List[str]) -> List[str]:
+        """Reorders fused candidates, best first.
+
+        'phrase' ranks by the share of the query's quoted phrases' terms each passage
+        contains (stable, so fused order breaks ties); 'cross-encoder' scores each
+        (query, passage) pair with a cross-encoder model.
+        """
+        if len(documents) < 2:
+            return documents
+        if self.rerank == "cross-encoder":
+            scores = get_cross_encoder(self.rerank_model_name).predict([(query, document) for document in documents])
+            return [documents[i] for i in np.argsort(-np.asarray(scores), kind="stable")]
+        phrases = [set(tokenize(match.group(2))) for match in _QUOTED_PHRASE.finditer(query)]
+        phrases = [terms for terms in phrases if terms] or [set(tokenize(query))]
+        def coverage(document: str) -> float:
+            terms = set(tokenize(document))
+            return sum(len(phrase & terms) / len(phrase) for phrase in phrases)
+        return sorted(documents, key=coverage, reverse=True)
@@ -0,0 +1,248 @@
+# rate_limiter.py
+import anthropic
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+from tracing import tracer
+
+# Status codes worth retrying: request timeout, conflict, rate limit, and server-side errors (incl. 529 overloaded)
+RETRYABLE_STATUS = {408, 409, 429}
+
+class TokenBucket:
+    """A per-minute budget that refills continuously. None means unlimited until a limit is learned."""
+
+    def __init__(self, per_minute: Optional[float] = None):
+        self.per_minute = per_minute
+        self.level = per_minute or 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.per_minute:
+            self.level = min(self.per_minute, self.level + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` now, going into debt if needed, and returns how long the caller must wait."""
+        with self._lock:
+            if not self.per_minute:
+                return 0.0
+            self._refill(time.monotonic())
+            # Never ask for more than a full bucket, or the wait could never end
+            self.level -= min(amount, self.per_minute)
+            return max(0.0, -self.level * 60.0 / self.per_minute)
+
+    def refund(self, amount: float):
+        with self._lock:
+            if self.per_minute:
+                self.level = min(self.per_minute, self.level + amount)
+
+    def observe(self, limit: Optional[float], remaining: Optional[float]):
+        """Adopts the server's view of this budget from its rate-limit headers."""
+        with self._lock:
+            if limit:
+                if not self.per_minute:
+                    self.level = limit
+                self._refill(time.monotonic())
+                self.per_minute = limit
+            if remaining is not None and self.per_minute:
+                self.level = min(self.level, remaining)
+
+class _Waiter:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+class AdaptiveConcurrencyLimit:
+    """A semaphore whose size can change at runtime. Safe to share across event loops and threads."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: "deque[_Waiter]" = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        with self._lock:
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self.in_use -= 1
+                    self._wake()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+            self._wake()
+
+    def set_limit(self, limit: int):
+        with self._lock:
+            self.limit = limit
+            self._wake()
+
+    def _wake(self):
+        # Caller holds self._lock
+        while self._waiters and self.in_use < self.limit:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_use += 1
+            waiter.loop.call_soon_threadsafe(lambda future=waiter.future: future.done() or future.set_result(None))
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class RateLimitController:
+    """Client-side rate limiting shared by every agent's API calls.
+
+    - Token buckets keep requests, input tokens and output tokens per minute under
+      the limits the API reports in its `anthropic-ratelimit-*` headers (or the
+      limits given here before the first response arrives).
+    - Retryable failures (429, 529 and other 5xx, connection errors) are retried with
+      exponential backoff and full jitter, waiting at least as long as `retry-after`.
+    - Concurrency adapts AIMD-style: +1 after a window of healthy responses, halved
+      on a 429/529 or when a budget's remaining headroom drops below 10%.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, input_tokens_per_minute: Optional[float] = None,
+                 output_tokens_per_minute: Optional[float] = None, initial_concurrency: int = 8,
+                 min_concurrency: int = 1, max_concurrency: int = 64, max_retries: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.input_tokens = TokenBucket(input_tokens_per_minute)
+        self.output_tokens = TokenBucket(output_tokens_per_minute)
+        self.concurrency = AdaptiveConcurrencyLimit(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._healthy_streak = 0
+        self._last_decrease = 0.0
+        self._stats = {"calls": 0, "retries": 0, "rate_limited": 0, "overloaded": 0,
+                       "throttle_seconds": 0.0, "backoff_seconds": 0.0, "min_concurrency_seen": initial_concurrency}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["concurrency_limit"] = self.concurrency.limit
+        return stats
+
+    def _count(self, key: str, amount: float = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _increase(self):
+        with self._lock:
+            self._healthy_streak += 1
+            limit = self.concurrency.limit
+            # One extra slot per full window of healthy responses (additive increase)
+            if self._healthy_streak < limit or limit >= self.max_concurrency:
+                return
+            self._healthy_streak = 0
+        self.concurrency.set_limit(limit + 1)
+
+    def _decrease(self):
+        with self._lock:
+            now = time.monotonic()
+            # A burst of 429s from one overload is one signal, not many
+            if now - self._last_decrease < 1.0:
+                return
+            self._last_decrease = now
+            self._healthy_streak = 0
+            limit = max(self.min_concurrency, self.concurrency.limit // 2)
+            self._stats["min_concurrency_seen"] = min(self._stats["min_concurrency_seen"], limit)
+        self.concurrency.set_limit(limit)
+
+    def _observe_headers(self, headers: Mapping[str, str]) -> bool:
+        """Feeds the rate-limit headers into the buckets; returns True if any budget is nearly spent."""
+        nearly_spent = False
+        for bucket, name in ((self.requests, "requests"), (self.input_tokens, "input-tokens"), (self.output_tokens, "output-tokens")):
+            limit = _header_float(headers, f"anthropic-ratelimit-{name}-limit")
+            remaining = _header_float(headers, f"anthropic-ratelimit-{name}-remaining")
+            bucket.observe(limit, remaining)
+            if limit and remaining is not None and remaining < 0.1 * limit:
+                nearly_spent = True
+        return nearly_spent
+
+    def _backoff_delay(self, attempt: int, error: anthropic.APIError) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = _header_float(response.headers, "retry-after") if response is not None else None
+        return max(delay, retry_after or 0.0)
+
+    @staticmethod
+    def _is_retryable(error: anthropic.APIError) -> bool:
+        if isinstance(error, anthropic.APIConnectionError):
+            return True
+        status = getattr(error, "status_code", None)
+        return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+    async def call(self, send: Callable[[Optional[anthropic.AsyncAnthropic]], Awaitable[Tuple[Any, Mapping[str, str], int]]],
+                   client: Optional[anthropic.AsyncAnthropic], input_tokens: int, max_output_tokens: int) -> Any:
+        """Runs `send(client)` under the limits, retrying retryable failures.
+
+        `send` returns (result, response headers, output tokens used). The client's own
+        retries are switched off so that every retry goes through this controller.
+        Backends without a client (the offline fake) pass None.
+        """
+        if client is not None:
+            client = client.with_options(max_retries=0)
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            wait = max(self.requests.reserve(1), self.input_tokens.reserve(input_tokens), self.output_tokens.reserve(max_output_tokens))
+            if wait:
+                self._count("throttle_seconds", wait)
+                tracer.add("throttle_seconds", wait)
+                await asyncio.sleep(wait)
+            await self.concurrency.acquire()
+            try:
+                result, headers, output_tokens = await send(client)
+            except anthropic.APIError as e:
+                # A failed call produced no output, so its whole output reservation goes back
+                self.output_tokens.refund(max_output_tokens)
+                status = getattr(e, "status_code", None)
+                if status == 429:
+                    self._count("rate_limited")
+                elif status == 529:
+                    self._count("overloaded")
+                if status in (429, 529):
+                    self._decrease()
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    raise
+                response = getattr(e, "response", None)
+                if response is not None:
+                    self._observe_headers(response.headers)
+                delay = self._backoff_delay(attempt, e)
+                print(f"    WARN: API call failed ({status or type(e).__name__}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s.")
+                self._count("retries")
+                tracer.add("retries")
+                self._count("backoff_seconds", delay)
+            else:
+                # Hand back the output budget that max_tokens reserved but the response didn't use
+                self.output_tokens.refund(max(0, max_output_tokens - (output_tokens or 0)))
+                if self._observe_headers(headers):
+                    self._decrease()
+                else:
+                    self._increase()
+                return result
+            finally:
+                self.concurrency.release()
+            await asyncio.sleep(delay)
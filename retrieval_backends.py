@@ -0,0 +1,246 @@
+# retrieval_backends.py
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import numpy as np
+
+class RetrievalBackend(ABC):
+    """Vector storage and author-scoped nearest-neighbour search used by RAGSystem."""
+
+    # Recorded in the persistent manifest; a change forces a rebuild
+    layout: str = ""
+
+    @abstractmethod
+    def reset(self):
+        """Drops everything stored under this backend's collection name."""
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        """Adds chunks, replacing any that already exist with the same id."""
+
+    @abstractmethod
+    def delete_source(self, source: str, author: str):
+        """Removes every chunk that came from the corpus file `source`."""
+
+    @abstractmethod
+    def search(self, author: str, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        """Returns the top_k documents by `author` for each query vector, best first."""
+
+    def flush(self):
+        """Persists pending writes, for backends that need it."""
+
+def _group_by_author(metadatas: List[Dict]) -> Dict[str, List[int]]:
+    groups: Dict[str, List[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        groups.setdefault(metadata["author"], []).append(i)
+    return groups
+
+# Chroma clients are shared per storage location across every backend in the process
+_chroma_clients: Dict[Optional[str], object] = {}
+_chroma_clients_lock = threading.Lock()
+
+def get_chroma_client(persist_directory: Optional[str] = None):
+    """Returns the process-wide Chroma client for `persist_directory` (None for in-memory), creating it on first use."""
+    key = os.path.abspath(persist_directory) if persist_directory else None
+    with _chroma_clients_lock:
+        if key not in _chroma_clients:
+            # Deferred: chromadb is slow to import and unused by the numpy backend
+            import chromadb
+            _chroma_clients[key] = chromadb.PersistentClient(path=key) if key else chromadb.Client()
+        return _chroma_clients[key]
+
+class ChromaBackend(RetrievalBackend):
+    """ChromaDB HNSW index, either one global collection filtered by author or one collection per author."""
+
+    def __init__(self, collection_name: str, persist_directory: Optional[str] = None, partition_by_author: bool = False):
+        self.collection_name = collection_name
+        self.partition_by_author = partition_by_author
+        self.layout = "chroma/per_author" if partition_by_author else "chroma/global"
+        self.client = get_chroma_client(persist_directory)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self._author_collections: Dict = {}
+
+    def _author_collection_name(self, author: str) -> str:
+        return f"{self.collection_name}__{re.sub(r'[^a-z0-9_-]', '_', author)}"
+
+    def _collection_for(self, author: str, create: bool = False):
+        """Returns the collection holding `author`'s chunks, or None if it doesn't exist yet."""
+        if not self.partition_by_author:
+            return self.collection
+        if author not in self._author_collections:
+            name = self._author_collection_name(author)
+            if create:
+                self._author_collections[author] = self.client.get_or_create_collection(name=name)
+            elif name in [c.name for c in self.client.list_collections()]:
+                self._author_collections[author] = self.client.get_collection(name=name)
+            else:
+                return None
+        return self._author_collections[author]
+
+    def reset(self):
+        prefix = f"{self.collection_name}__"
+        for collection in self.client.list_collections():
+            if collection.name == self.collection_name or collection.name.startswith(prefix):
+                self.client.delete_collection(name=collection.name)
+        self._author_collections = {}
+        self.collection = self.client.create_collection(name=self.collection_name)
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        if self.partition_by_author:
+            groups = [(self._collection_for(author, create=True), indices) for author, indices in _group_by_author(metadatas).items()]
+        else:
+            groups = [(self.collection, list(range(len(ids))))]
+
+        # Write in slices no larger than the client accepts in one call
+        write_batch = self.client.get_max_batch_size()
+        for collection, indices in groups:
+            for start in range(0, len(indices), write_batch):
+                batch = indices[start:start + write_batch]
+                collection.upsert(
+                    embeddings=embeddings[batch],
+                    documents=[documents[i] for i in batch],
+                    metadatas=[metadatas[i] for i in batch],
+                    ids=[ids[i] for i in batch]
+                )
+
+    def delete_source(self, source: str, author: str):
+        collection = self._collection_for(author)
+        if collection is not None:
+            collection.delete(where={"source": source})
+
+    def search(self, author: str, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        collection = self._collection_for(author)
+        if collection is None:
+            return [[] for _ in range(len(query_embeddings))]
+        search = {"query_embeddings": query_embeddings, "n_results": top_k}
+        if not self.partition_by_author:
+            search["where"] = {"author": author} # Filter results by author
+        results = collection.query(**search)
+        return results['documents'] or [[] for _ in range(len(query_embeddings))]
+
+class _AuthorMatrix:
+    """One author's normalized embeddings as a contiguous float32 matrix, plus row metadata."""
+
+    def __init__(self, embeddings: np.ndarray, ids: List[str], documents: List[str], sources: List[str]):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.documents = documents
+        self.sources = sources
+
+    @classmethod
+    def empty(cls, dim: int) -> "_AuthorMatrix":
+        return cls(np.empty((0, dim), dtype=np.float32), [], [], [])
+
+    def keep(self, mask: np.ndarray) -> "_AuthorMatrix":
+        rows = np.flatnonzero(mask)
+        return _AuthorMatrix(
+            np.ascontiguousarray(self.embeddings[rows]),
+            [self.ids[i] for i in rows],
+            [self.documents[i] for i in rows],
+            [self.sources[i] for i in rows],
+        )
+
+class NumpyBackend(RetrievalBackend):
+    """Exact brute-force search: one normalized float32 matrix per author, top-k by a single matrix product.
+
+    With a persist_directory the matrices are saved as .npy files and reopened
+    memory-mapped, so a warm start reads only the pages a query touches.
+    """
+
+    layout = "numpy"
+
+    def __init__(self, collection_name: str, persist_directory: Optional[str] = None, mmap: bool = True):
+        self.collection_name = collection_name
+        self.directory = os.path.join(persist_directory, f"{collection_name}_numpy") if persist_directory else None
+        self.mmap = mmap
+        self._partitions: Dict[str, _AuthorMatrix] = {}
+        self._dirty: set = set()
+        if self.directory and os.path.isdir(self.directory):
+            self._load()
+
+    def _paths(self, author: str):
+        stem = os.path.join(self.directory, re.sub(r'[^a-z0-9_-]', '_', author))
+        return stem + ".npy", stem + ".json"
+
+    def _load(self):
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+            matrix_path, _ = self._paths(rows["author"])
+            embeddings = np.load(matrix_path, mmap_mode='r' if self.mmap else None)
+            self._partitions[rows["author"]] = _AuthorMatrix(embeddings, rows["ids"], rows["documents"], rows["sources"])
+
+    def reset(self):
+        self._dirty.update(self._partitions)
+        self._partitions = {}
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+        for author, indices in _group_by_author(metadatas).items():
+            current = self._partitions.get(author) or _AuthorMatrix.empty(embeddings.shape[1])
+            new_ids = {ids[i] for i in indices}
+            current = current.keep(np.array([row_id not in new_ids for row_id in current.ids], dtype=bool))
+            self._partitions[author] = _AuthorMatrix(
+                np.ascontiguousarray(np.vstack([current.embeddings, embeddings[indices]])),
+                current.ids + [ids[i] for i in indices],
+                current.documents + [documents[i] for i in indices],
+                current.sources + [metadatas[i]["source"] for i in indices],
+            )
+            self._dirty.add(author)
+
+    def delete_source(self, source: str, author: str):
+        current = self._partitions.get(author)
+        if current is None:
+            return
+        self._partitions[author] = current.keep(np.array([s != source for s in current.sources], dtype=bool))
+        self._dirty.add(author)
+
+    def search(self, author: str, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        partition = self._partitions.get(author)
+        if partition is None or not partition.ids:
+            return [[] for _ in range(len(query_embeddings))]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ partition.embeddings.T
+        k = min(top_k, scores.shape[1])
+        # argpartition finds the top k in linear time; only those k get sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        top = np.take_along_axis(top, order, axis=1)
+        return [[partition.documents[i] for i in row] for row in top]
+
+    def flush(self):
+        if not self.directory or not self._dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for author in sorted(self._dirty):
+            matrix_path, rows_path = self._paths(author)
+            partition = self._partitions.get(author)
+            if partition is None or not partition.ids:
+                for path in (matrix_path, rows_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                continue
+            np.save(matrix_path + ".tmp.npy", np.ascontiguousarray(partition.embeddings))
+            os.replace(matrix_path + ".tmp.npy", matrix_path)
+            with open(rows_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({"author": author, "ids": partition.ids, "documents": partition.documents,
+                           "sources": partition.sources}, f)
+            os.replace(rows_path + ".tmp", rows_path)
+        self._dirty = set()
+
+def create_backend(kind: str, collection_name: str, persist_directory: Optional[str] = None, **options) -> RetrievalBackend:
+    """Builds a backend by name: 'chroma' or 'numpy'."""
+    if kind == "chroma":
+        return ChromaBackend(collection_name, persist_directory, partition_by_author=options.get("partition_by_author", False))
+    if kind == "numpy":
+        return NumpyBackend(collection_name, persist_directory, mmap=options.get("mmap", True))
+    raise ValueError(f"Unknown retrieval backend '{kind}'. Expected 'chroma' or 'numpy'.")
@@ -1,12 +1,32 @@
 # run_analysis.py
+"""Scores simple vs. complex founder statements with the Arbiter agent.
+
+Reads the runners' outputs (sweep results.jsonl or markdown transcripts), pairs
+each founder's simple and complex statement on the same topic, and judges every
+pair concurrently, optionally several times with the A/B positions swapped.
+Example:
+
+    python run_analysis.py sweep_results/<run_id> --samples 4 --output arbiter_scores.csv
+"""
+import argparse
+import csv
+import glob
+import os
 import yaml
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import xml.etree.ElementTree as ET
 
 load_dotenv()
 
+from base_agent import BaseAgent
+from rate_limiter import RateLimitController
+from response_cache import default_response_cache
+from fake_llm_backend import FakeLLMBackend
+from run_report import print_run_stats
 from specialist_agents import ArbiterAgent
 
 # --- START OF MANUAL INPUT SECTION ---
@@ -387,41 +407,228 @@ def display_final_report(judgment: dict, simple_arg: str, complex_arg: str):
         print("Raw data received from the agent:")
         print(data)
 
-def run_all_analyses():
+SCORE_FIELDS = ["structure", "depth", "support", "rhetoric", "final"]
+SCORE_COLUMNS = ["founder", "topic", "sample", "swapped"] + \
+    [f"{model}_{field}" for model in ("simple", "complex") for field in SCORE_FIELDS] + ["winner", "error"]
+
+def _load_jsonl(path: str) -> List[Dict[str, str]]:
+    """Reads results.jsonl from run_sweep.py, skipping pipelines that failed."""
+    outputs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("failed"):
+                print(f"    WARN: Skipping failed {record.get('model_type')} pipeline for {record.get('founder')} in {path}.")
+                continue
+            outputs.append({key: record[key] for key in ("model_type", "topic", "founder", "statement")})
+    return outputs
+
+def _load_transcript(path: str) -> List[Dict[str, str]]:
+    """Reads a markdown transcript written by DebateOrchestrator.save_transcript."""
+    outputs = []
+    topic, model_type, current = None, None, None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith("# Simulation Topic:"):
+                topic = line[len("# Simulation Topic:"):].strip()
+            elif re.match(r"^## (SIMPLE|COMPLEX) Model Outputs", line):
+                model_type = line.split()[1].lower()
+                current = None
+            elif line.startswith("### ") and line.rstrip().endswith(":") and model_type:
+                current = {"model_type": model_type, "topic": topic, "founder": line[4:].rstrip()[:-1], "statement": ""}
+                outputs.append(current)
+            elif current is not None:
+                current["statement"] += line
+    for output in outputs:
+        output["statement"] = output["statement"].strip()
+    return outputs
+
+def load_runner_outputs(paths: List[str]) -> List[Dict[str, str]]:
+    """Collects founder statements from runner output files (.jsonl sweep records or .md transcripts).
+
+    Directories are searched for results.jsonl records, falling back to .md transcripts
+    when there are none (a sweep directory holds the same statements in both, plus
+    its trace.jsonl, which is not a record file).
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = sorted(glob.glob(os.path.join(path, "**", "results.jsonl"), recursive=True))
+            files.extend(found or sorted(glob.glob(os.path.join(path, "**", "*.md"), recursive=True)))
+        else:
+            files.append(path)
+    outputs = []
+    for path in files:
+        loaded = _load_jsonl(path) if path.endswith(".jsonl") else _load_transcript(path)
+        print(f"  - {path}: {len(loaded)} statements")
+        outputs.extend(loaded)
+    return outputs
+
+def pair_outputs(outputs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Matches each founder's simple and complex statements on the same topic."""
+    by_key: Dict[Tuple[str, str], Dict[str, str]] = {}
+    for output in outputs:
+        statement = output["statement"]
+        # Placeholder text left behind by a failed API call isn't worth judging
+        if not statement or statement.startswith("("):
+            continue
+        # A later file (e.g. a re-run) replaces an earlier statement for the same key
+        by_key.setdefault((output["topic"], output["founder"]), {})[output["model_type"]] = statement
+    pairs = []
+    for (topic, founder), statements in by_key.items():
+        if "simple" not in statements or "complex" not in statements:
+            missing = "complex" if "simple" in statements else "simple"
+            print(f"    WARN: No {missing} statement for {founder} on '{topic}'; skipping.")
+            continue
+        pairs.append({"founder": founder, "topic": topic,
+                      "simple_argument": statements["simple"], "complex_argument": statements["complex"]})
+    return pairs
+
+def unblind_judgment(judgment: dict, swapped: bool) -> dict:
+    """Maps a blind A/B judgment back onto the simple/complex layout display_final_report expects."""
+    scores = judgment.get("scores", {})
+    first, second = scores.get("argument_A", {}), scores.get("argument_B", {})
+    simple_scores, complex_scores = (second, first) if swapped else (first, second)
+    winner = str(judgment.get("winning_argument", "")).strip().lower()
+    if winner in ("argument a", "a", "argument_a"):
+        winning_model = "Complex Model" if swapped else "Simple Model"
+    elif winner in ("argument b", "b", "argument_b"):
+        winning_model = "Simple Model" if swapped else "Complex Model"
+    else:
+        winning_model = judgment.get("winning_argument", "N/A")
+    return {
+        "scores": {"simple_model_argument_A": simple_scores, "complex_model_argument_B": complex_scores},
+        "winning_model": winning_model,
+        "justification": judgment.get("justification", "No justification provided."),
+    }
+
+def judge_pair(arbiter: ArbiterAgent, arbiter_prompts: dict, pair: Dict[str, str], sample: int) -> Tuple[dict, dict]:
+    """Runs one arbiter sample on a pair. Odd samples swap the A/B positions to cancel out position bias.
+
+    Returns the unblinded judgment (or the arbiter's error dict) and its score row.
+    """
+    swapped = sample % 2 == 1
+    first, second = (pair["complex_argument"], pair["simple_argument"]) if swapped else (pair["simple_argument"], pair["complex_argument"])
+    founder_prompts = arbiter_prompts.get(pair["founder"].split(' ')[-1], arbiter_prompts['Hamilton'])
+    user_prompt = arbiter_prompts['user_prompt_template'].format(argument_a=first, argument_b=second)
+    judgment = arbiter.run(founder_prompts['system_prompt'], user_prompt, sample=sample)
+
+    row = {column: None for column in SCORE_COLUMNS}
+    row.update(founder=pair["founder"], topic=pair["topic"], sample=sample, swapped=swapped)
+    if "error" in judgment:
+        row["error"] = judgment["error"]
+        return judgment, row
+    judgment = unblind_judgment(judgment, swapped)
+    for model, key in (("simple", "simple_model_argument_A"), ("complex", "complex_model_argument_B")):
+        model_scores = judgment["scores"][key]
+        for field in SCORE_FIELDS:
+            row[f"{model}_{field}"] = model_scores.get(f"{field}_score")
+    row["winner"] = {"Simple Model": "simple", "Complex Model": "complex"}.get(judgment["winning_model"])
+    return judgment, row
+
+def score_pairs(arbiter: ArbiterAgent, arbiter_prompts: dict, pairs: List[Dict[str, str]], samples: int = 1,
+                max_concurrency: int = 8) -> List[Tuple[Dict[str, str], dict, dict]]:
+    """Judges every pair `samples` times, all concurrently. Returns (pair, judgment, row) in input order."""
+    jobs = [(pair, sample) for pair in pairs for sample in range(samples)]
+    print(f"--- Scoring {len(pairs)} pairs x {samples} samples = {len(jobs)} arbiter calls, {max_concurrency} at a time ---")
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="arbiter") as executor:
+        futures = [executor.submit(judge_pair, arbiter, arbiter_prompts, pair, sample) for pair, sample in jobs]
+        results = [future.result() for future in futures]
+    return [(pair, judgment, row) for (pair, _), (judgment, row) in zip(jobs, results)]
+
+def write_scores(rows: List[dict], path: str):
+    """Writes one row per arbiter sample. A .parquet path needs pandas (and pyarrow); anything else is CSV."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            print("ERROR: Writing Parquet requires pandas. Install it with 'pip install pandas pyarrow', or use a .csv output.")
+            return
+        pd.DataFrame(rows, columns=SCORE_COLUMNS).to_parquet(path, index=False)
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SCORE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f"\nArbiter scores saved to {path}")
+
+def print_score_summary(rows: List[dict]):
+    scored = [row for row in rows if row["error"] is None]
+    print(f"\nScored {len(scored)} of {len(rows)} samples.")
+    for model in ("simple", "complex"):
+        finals = [row[f"{model}_final"] for row in scored if isinstance(row[f"{model}_final"], (int, float))]
+        wins = sum(1 for row in scored if row["winner"] == model)
+        if finals:
+            print(f"  - {model.capitalize()} model: mean final score {sum(finals) / len(finals):.1f}, {wins} wins")
+    for swapped in (False, True):
+        subset = [row for row in scored if row["swapped"] == swapped and row["winner"]]
+        if subset:
+            # With no position bias, the argument shown first wins about as often in either order
+            first_wins = sum(1 for row in subset if (row["winner"] == "complex") == swapped)
+            print(f"  - {'Swapped' if swapped else 'Original'} order: argument A won {first_wins}/{len(subset)}")
+
+def run_all_analyses(paths: Optional[List[str]] = None, samples: int = 1, max_concurrency: int = 8,
+                     output: str = "arbiter_scores.csv", report: bool = False):
     try:
+        BaseAgent.configure_cache(default_response_cache())
+        BaseAgent.configure_rate_limiter(RateLimitController())
         arbiter = ArbiterAgent()
         with open("prompts.yaml", "r", encoding='utf-8') as f:
             all_prompts = yaml.safe_load(f)
         arbiter_prompts = all_prompts['ArbiterAgent']
-        system_prompt = arbiter_prompts['Hamilton']['system_prompt']
-        user_prompt_template = arbiter_prompts['user_prompt_template']
     except Exception as e:
         print(f"ERROR during setup: {e}")
         return
 
-    for i, debate in enumerate(debates_to_analyze):
-        founder_name = debate["founder_name"]
-        simple_argument = debate["simple_argument"].strip()
-        complex_argument = debate["complex_argument"].strip()
-
-        print(f"\n\n{'#'*25} ANALYSIS #{i+1}: {founder_name.upper()} {'#'*25}")
-
-        if not simple_argument or "(Paste" in simple_argument:
-            print(f"Skipping {founder_name}: One or both arguments are empty or placeholders.")
-            continue
-
-        user_prompt = user_prompt_template.format(simple_model_argument=simple_argument, complex_model_argument=complex_argument)
+    if paths:
+        print("--- Loading runner outputs ---")
+        pairs = pair_outputs(load_runner_outputs(paths))
+    else:
+        # No inputs given: fall back to the arguments pasted into the manual section above
+        pairs = []
+        for debate in debates_to_analyze:
+            simple_argument = debate["simple_argument"].strip()
+            complex_argument = debate["complex_argument"].strip()
+            if not simple_argument or "(Paste" in simple_argument:
+                print(f"Skipping {debate['founder_name']}: One or both arguments are empty or placeholders.")
+                continue
+            pairs.append({"founder": debate["founder_name"], "topic": debate.get("topic", ""),
+                          "simple_argument": simple_argument, "complex_argument": complex_argument})
+        # The hand-pasted list is small enough to read in full
+        report = True
+    if not pairs:
+        print("ERROR: No simple/complex pairs to score.")
+        return
 
-        print("\nCalling Arbiter Agent to evaluate the arguments...")
-        judgment_output = arbiter.run(system_prompt, user_prompt)
+    results = score_pairs(arbiter, arbiter_prompts, pairs, samples=samples, max_concurrency=max_concurrency)
+    rows = [row for _, _, row in results]
+    if report:
+        for i, (pair, judgment, row) in enumerate(results):
+            print(f"\n\n{'#'*25} ANALYSIS #{i+1}: {pair['founder'].upper()} (sample {row['sample']}) {'#'*25}")
+            if "error" in judgment:
+                print(f"\n--- ARBITER AGENT FAILED FOR {pair['founder']} ---")
+                print(judgment.get("response", "No response text available."))
+            else:
+                display_final_report(judgment, pair["simple_argument"], pair["complex_argument"])
 
-        if "error" in judgment_output:
-            print(f"\n--- ARBITER AGENT FAILED FOR {founder_name} ---")
-            print(judgment_output.get("response", "No response text available."))
-        else:
-            display_final_report(judgment_output, simple_argument, complex_argument)
-    
+    write_scores(rows, output)
+    print_score_summary(rows)
+    print_run_stats()
     print("\n\n--- All Analyses Complete ---")
 
 if __name__ == "__main__":
-    run_all_analyses()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="*", help="Runner outputs: sweep results.jsonl files, markdown transcripts, or directories of them. Defaults to the manual list above.")
+    parser.add_argument("--samples", type=int, default=1, help="Arbiter samples per pair; odd samples swap the A/B positions.")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Arbiter calls in flight at once.")
+    parser.add_argument("--output", default="arbiter_scores.csv", help="Score table to write (.csv, or .parquet with pandas installed).")
+    parser.add_argument("--report", action="store_true", help="Also print the full report for every sample.")
+    parser.add_argument("--fake-llm", action="store_true", help="Answer every request from the offline FakeLLMBackend instead of the API.")
+    args = parser.parse_args()
+    if args.fake_llm:
+        BaseAgent.configure_backend(FakeLLMBackend())
+    run_all_analyses(args.inputs, samples=args.samples, max_concurrency=args.max_concurrency, output=args.output, report=args.report)
@@ -0,0 +1,37 @@
+# run_report.py
+"""The end-of-run statistics every runner prints."""
+from typing import Optional
+
+from base_agent import BaseAgent
+from checkpoint_store import CheckpointStore
+from specialist_agents import ResearcherAgent
+from tracing import print_trace_summary, tracer
+
+def print_run_stats(researcher: Optional[ResearcherAgent] = None, checkpoint_store: Optional[CheckpointStore] = None):
+    """Prints the stats for whatever this run configured and used: parsing, prompt cache and
+    latency once a request was made, then the response cache, checkpoints, rate limiter,
+    Researcher caches and trace summary where set up."""
+    parse_stats = BaseAgent.parse_stats()
+    if parse_stats['local'] or parse_stats['fallback']:
+        print(f"JSON parsing: {parse_stats['local']} parsed locally, {parse_stats['fallback']} needed the extraction call ({parse_stats['fallback_rate']:.0%}).")
+    usage = BaseAgent.usage_stats()
+    if usage['requests']:
+        print(f"Prompt cache: {usage['cache_read_input_tokens']} input tokens read, {usage['cache_creation_input_tokens']} written, {usage['input_tokens']} uncached ({usage['cache_read_rate']:.0%} read from cache).")
+        print(f"API latency: {usage['cache_read_mean_seconds']:.1f}s mean with a prompt-cache read, {usage['uncached_mean_seconds']:.1f}s without.")
+    if usage['streamed_requests']:
+        print(f"Streaming: first token after {usage['first_token_mean_seconds']:.1f}s on average; {usage['streams_stopped_at_json']} of {usage['streamed_requests']} streams stopped at the closing brace.")
+    if BaseAgent.response_cache is not None:
+        cache_stats = BaseAgent.response_cache.stats()
+        print(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.")
+    if checkpoint_store is not None:
+        print(f"Checkpoints: {checkpoint_store.restored} stages resumed, {checkpoint_store.saved} saved under run {checkpoint_store.run_id}.")
+    if BaseAgent.rate_limiter is not None:
+        limiter_stats = BaseAgent.rate_limiter.stats()
+        print(f"Rate limiter: {limiter_stats['retries']} retries ({limiter_stats['rate_limited']} rate-limited, {limiter_stats['overloaded']} overloaded), concurrency limit {limiter_stats['concurrency_limit']}.")
+    if researcher is not None:
+        for cache_name, stats in researcher.cache_stats().items():
+            print(f"Researcher {cache_name} cache: {stats['hits']} hits, {stats['misses']} misses.")
+    if tracer.enabled:
+        print_trace_summary(tracer.spans)
+        if tracer.path:
+            print(f"Trace saved to {tracer.path}")
@@ -1,51 +1,62 @@
 # run_simple_model.py
+import argparse
 import yaml
 from dotenv import load_dotenv
 load_dotenv()
 
+from base_agent import BaseAgent
+from rate_limiter import RateLimitController
+from response_cache import default_response_cache
+from batch_dispatcher import BatchDispatcher
+from checkpoint_store import CheckpointStore
 from environment import DebateOrchestrator
 from rag_system import RAGSystem
-from historical_agent import HistoricalAgent
-from specialist_agents import SelectorAgent, ResearcherAgent, ThinkerAgent, CommunicatorAgent
+from fake_llm_backend import FakeLLMBackend
+from run_report import print_run_stats
+from tracing import tracer
+from founders import build_founder_agents, build_specialist_agents
 
-def load_persona_profile(founder_name: str) -> str:
-    try:
-        filename = f"corpora/{founder_name.lower().split(' ')[-1]}.txt"
-        with open(filename, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        print(f"ERROR: Persona profile for {founder_name} not found.")
-        return ""
+# Number of founder pipelines allowed to run at the same time
+MAX_CONCURRENT_FOUNDERS = 3
 
-def run_simple_simulation():
+def run_simple_simulation(batch_dispatcher: BatchDispatcher = None, resume_run_id: str = None):
     print("--- Initializing SIMPLE Model Simulation ---")
     try:
-        rag_system = RAGSystem(corpora_path="corpora")
+        BaseAgent.configure_cache(default_response_cache())
+        BaseAgent.configure_rate_limiter(RateLimitController())
+        checkpoint_store = CheckpointStore(run_id=resume_run_id)
+        if resume_run_id and not checkpoint_store.has_run(resume_run_id):
+            print(f"    WARN: No checkpoints found for run {resume_run_id}; starting it from scratch.")
+        print(f"Run ID: {checkpoint_store.run_id} (continue an interrupted run with --resume {checkpoint_store.run_id})")
+        rag_system = RAGSystem(corpora_path="corpora", persist_directory="vector_store", backend="numpy")
         with open("prompts.yaml", "r") as f:
             all_prompts = yaml.safe_load(f)
     except Exception as e:
         print(f"ERROR during setup: {e}")
         return
     
-    specialist_agents = {
-        "selector": SelectorAgent(),
-        "researcher": ResearcherAgent(rag_system=rag_system),
-        "thinker": ThinkerAgent(),
-        "communicator": CommunicatorAgent()
-    }
-
-    founders = ["Alexander Hamilton", "Thomas Jefferson", "James Madison"]
-    agents = []
-    for name in founders:
-        profile = load_persona_profile(name)
-        if profile:
-            agents.append(HistoricalAgent(name=name, persona_profile=profile, all_prompts=all_prompts, specialist_agents=specialist_agents))
+    specialist_agents = build_specialist_agents(rag_system)
+    agents = build_founder_agents(all_prompts, specialist_agents)
 
     debate_topic = "Should the United States annex and incorporate Canada and Mexico to form a continental super-national to strengthen its economic and political power and influence?"
-    orchestrator = DebateOrchestrator(agents, debate_topic)
-    orchestrator.run_simulation(model_type='simple')
+    orchestrator = DebateOrchestrator(agents, debate_topic, checkpoint_store=checkpoint_store)
+    orchestrator.run_simulation(model_type='simple', max_concurrency=MAX_CONCURRENT_FOUNDERS, batch_dispatcher=batch_dispatcher)
     orchestrator.save_transcript(filename="simple_model_results.md")
+    print_run_stats(researcher=specialist_agents["researcher"], checkpoint_store=checkpoint_store)
     print("\n--- Simple Simulation Complete ---")
 
 if __name__ == "__main__":
-    run_simple_simulation()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", action="store_true", help="Send each pipeline step for all founders as one Message Batch.")
+    parser.add_argument("--stream", action="store_true", help="Stream responses, stopping each once its JSON closes, and echo final statements live.")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a partially finished run, skipping stages it already completed.")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="Seconds between batch status checks.")
+    parser.add_argument("--fake-llm", action="store_true", help="Answer every request from the offline FakeLLMBackend instead of the API.")
+    parser.add_argument("--trace", metavar="PATH", help="Record timing/token spans to this JSONL file and print a per-stage summary.")
+    args = parser.parse_args()
+    BaseAgent.configure_streaming(args.stream)
+    if args.fake_llm:
+        BaseAgent.configure_backend(FakeLLMBackend())
+    if args.trace:
+        tracer.configure(args.trace)
+    run_simple_simulation(BatchDispatcher(poll_interval=args.poll_interval, backend=BaseAgent.backend) if args.batch else None, resume_run_id=args.resume)
\ No newline at end of file
@@ -0,0 +1,124 @@
+# run_sweep.py
+"""Runs the full topics x founders x models grid in one process.
+
+The RAG index, prompts and agents are built once and shared by every
+simulation in the grid. Results go to sweep_results/<run_id>/: one JSONL record
+per (model, topic, founder) plus a markdown transcript per (model, topic).
+Example:
+
+    python run_sweep.py --topics topics.txt --models simple complex --max-concurrency 6
+"""
+import argparse
+import json
+import os
+import yaml
+from dotenv import load_dotenv
+load_dotenv()
+
+from base_agent import BaseAgent
+from rate_limiter import RateLimitController
+from response_cache import default_response_cache
+from batch_dispatcher import BatchDispatcher
+from checkpoint_store import CheckpointStore
+from environment import DebateOrchestrator, run_batched_simulations, run_simulation_grid
+from rag_system import RAGSystem
+from fake_llm_backend import FakeLLMBackend
+from run_report import print_run_stats
+from tracing import tracer
+from founders import DEFAULT_FOUNDERS, build_founder_agents, build_specialist_agents
+from typing import List, Tuple
+
+MODEL_TYPES = ["simple", "complex"]
+
+def load_topics(path: str) -> List[str]:
+    """One topic per line; blank lines and lines starting with '#' are ignored."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def write_results(output_dir: str, run_id: str, runs: List[Tuple[int, str, DebateOrchestrator]]):
+    """Writes results.jsonl and one markdown transcript per (model, topic)."""
+    os.makedirs(output_dir, exist_ok=True)
+    records_path = os.path.join(output_dir, "results.jsonl")
+    with open(records_path, 'w', encoding='utf-8') as f:
+        for topic_index, model_type, orchestrator in runs:
+            for agent in orchestrator.agents:
+                pipeline_run = orchestrator.pipeline_runs.get(agent.name)
+                failure = pipeline_run.failure if pipeline_run is not None else orchestrator.responses.get(agent.name)
+                record = {
+                    "run_id": run_id,
+                    "model_type": model_type,
+                    "topic_index": topic_index,
+                    "topic": orchestrator.topic,
+                    "founder": agent.name,
+                    "statement": orchestrator.responses.get(agent.name, ""),
+                    "failed": failure is not None,
+                    "failure": failure,
+                    "stage_timings": pipeline_run.stage_timings if pipeline_run is not None else {},
+                    "resumed_stages": pipeline_run.resumed_stages if pipeline_run is not None else [],
+                    "wall_time": pipeline_run.wall_time if pipeline_run is not None else None,
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"\nSweep records saved to {records_path}")
+    for topic_index, model_type, orchestrator in runs:
+        orchestrator.save_transcript(filename=os.path.join(output_dir, f"{model_type}_topic{topic_index}.md"))
+
+def run_sweep(args: argparse.Namespace):
+    print("--- Initializing Sweep ---")
+    try:
+        topics = load_topics(args.topics)
+        BaseAgent.configure_cache(default_response_cache())
+        BaseAgent.configure_rate_limiter(RateLimitController())
+        BaseAgent.configure_streaming(args.stream)
+        if args.fake_llm:
+            BaseAgent.configure_backend(FakeLLMBackend())
+        checkpoint_store = CheckpointStore(run_id=args.resume)
+        if args.trace:
+            tracer.configure(os.path.join(args.output_dir, checkpoint_store.run_id, "trace.jsonl"))
+        if args.resume and not checkpoint_store.has_run(args.resume):
+            print(f"    WARN: No checkpoints found for run {args.resume}; starting it from scratch.")
+        rag_system = RAGSystem(corpora_path="corpora", persist_directory="vector_store", backend="numpy")
+        with open("prompts.yaml", "r") as f:
+            all_prompts = yaml.safe_load(f)
+    except Exception as e:
+        print(f"ERROR during setup: {e}")
+        return
+    if not topics:
+        print(f"ERROR: No topics found in {args.topics}.")
+        return
+    print(f"Run ID: {checkpoint_store.run_id} (continue an interrupted sweep with --resume {checkpoint_store.run_id})")
+
+    specialist_agents = build_specialist_agents(rag_system)
+    agents = build_founder_agents(all_prompts, specialist_agents, args.founders)
+
+    runs = [(topic_index, model_type, DebateOrchestrator(agents, topic, checkpoint_store=checkpoint_store))
+            for model_type in args.models for topic_index, topic in enumerate(topics, start=1)]
+    print(f"Grid: {len(topics)} topics x {len(agents)} founders x {len(args.models)} models = {len(runs) * len(agents)} pipelines")
+
+    if args.batch:
+        dispatcher = BatchDispatcher(poll_interval=args.poll_interval, backend=BaseAgent.backend)
+        for model_type in args.models:
+            run_batched_simulations([orchestrator for _, m, orchestrator in runs if m == model_type], model_type, dispatcher)
+    else:
+        run_simulation_grid([(orchestrator, model_type) for _, model_type, orchestrator in runs], max_concurrency=args.max_concurrency)
+
+    write_results(os.path.join(args.output_dir, checkpoint_store.run_id), checkpoint_store.run_id, runs)
+    failed = sum(1 for _, _, orchestrator in runs for agent in orchestrator.agents
+                 if orchestrator.pipeline_runs.get(agent.name) is None or orchestrator.pipeline_runs[agent.name].failure is not None)
+    print(f"Pipelines: {len(runs) * len(agents) - failed} succeeded, {failed} failed.")
+    print_run_stats(researcher=specialist_agents["researcher"], checkpoint_store=checkpoint_store)
+    print("\n--- Sweep Complete ---")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", default="topics.txt", help="File with one debate topic per line.")
+    parser.add_argument("--founders", nargs="+", default=DEFAULT_FOUNDERS)
+    parser.add_argument("--models", nargs="+", choices=MODEL_TYPES, default=MODEL_TYPES)
+    parser.add_argument("--max-concurrency", type=int, default=6, help="Founder pipelines in flight across the whole grid.")
+    parser.add_argument("--output-dir", default="sweep_results")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a partially finished sweep, skipping stages it already completed.")
+    parser.add_argument("--batch", action="store_true", help="Send each pipeline step for the whole grid as one Message Batch per model type.")
+    parser.add_argument("--stream", action="store_true", help="Stream responses, stopping each once its JSON closes.")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="Seconds between batch status checks.")
+    parser.add_argument("--fake-llm", action="store_true", help="Answer every request from the offline FakeLLMBackend instead of the API.")
+    parser.add_argument("--trace", action="store_true", help="Record timing/token spans to trace.jsonl next to the results and print a per-stage summary.")
+    run_sweep(parser.parse_args())
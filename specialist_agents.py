@@ -1,51 +1,83 @@
 # specialist_agents.py
+import asyncio
 from base_agent import BaseAgent
-from rag_system import RAGSystem
-from typing import Dict, Any
+from response_cache import MemoryLRUCache
+from tracing import tracer
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple
+
+if TYPE_CHECKING:
+    # Type-only import: scoring-only runs (run_analysis.py) never load the retrieval stack
+    from rag_system import RAGSystem
 
 class SelectorAgent(BaseAgent):
+    max_tokens = 800
     def __init__(self): super().__init__(name="Selector")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 800)
 
 class ThinkerAgent(BaseAgent):
+    max_tokens = 4000
     def __init__(self): super().__init__(name="Thinker")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 4000)
 
 class ValidatorAgent(BaseAgent):
+    max_tokens = 4000
     def __init__(self): super().__init__(name="Validator")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 4000)
 
 class RedTeamAgent(BaseAgent):
+    max_tokens = 4000
     def __init__(self): super().__init__(name="RedTeam")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 4000)
 
 class StrategistAgent(BaseAgent):
+    max_tokens = 4000
     def __init__(self): super().__init__(name="Strategist")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 4000)
 
 class FinalJudgeAgent(BaseAgent):
+    max_tokens = 4000
     def __init__(self): super().__init__(name="FinalJudge")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 4000)
 
 class CommunicatorAgent(BaseAgent):
+    max_tokens = 2000
+    stream_field = "final_statement"
     def __init__(self): super().__init__(name="Communicator")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 2000)
 
 class ArbiterAgent(BaseAgent):
+    max_tokens = 4000
     def __init__(self): super().__init__(name="Arbiter")
-    def run(self, s: str, u: str) -> Dict: return self.execute_task(s, u, 4000)
 
 class ResearcherAgent:
-    def __init__(self, rag_system: RAGSystem):
+    # Shared by every researcher in the process, so founders and back-to-back simple/complex
+    # runs reuse each other's lookups. Keys include the index version, so a rebuilt
+    # index never serves stale passages.
+    retrieval_cache = MemoryLRUCache(max_entries=1024)
+
+    def __init__(self, rag_system: "RAGSystem"):
         self.rag_system = rag_system
         self.name = "Researcher"
-        
-    def run(self, selector_output: Dict, topic: str, author_name: str) -> Dict[str, str]:
-        print(f"     > Executing task for agent: {self.name} for {author_name}...")
-        
+
+    def _cached_query_many(self, queries: List[Tuple[str, str, int]]) -> List[str]:
+        """query_many with memoized results keyed on (normalized query, author, top_k, index version)."""
+        keys = [
+            (self.rag_system.normalize_query(text), author, top_k, self.rag_system.index_version)
+            for text, author, top_k in queries
+        ]
+        with tracer.span("researcher", agent=self.name, queries=len(queries)) as span:
+            results = [self.retrieval_cache.get(key) for key in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+            span.set(retrieval_cache_hits=len(queries) - len(missing))
+            if missing:
+                fetched = self.rag_system.query_many([queries[i] for i in missing])
+                for i, result in zip(missing, fetched):
+                    self.retrieval_cache.set(keys[i], result)
+                    results[i] = result
+            return results
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counts for the retrieval result cache and the query embedding cache."""
+        return {"retrieval": self.retrieval_cache.stats(), "query_embeddings": self.rag_system.query_embedding_cache.stats()}
+
+    def _core_queries(self, selector_output: Dict, topic: str, author_name: str) -> List[Tuple[str, str, int]]:
+        """The principle and precedent lookups in the founder's own writings."""
         # Safely extract core principle
         core_principle = selector_output.get("core_principle", "")
-        
+
         # Safely extract historical precedent issue
         precedent_value = selector_output.get("historical_precedent", {})
         precedent_issue = ""
@@ -54,11 +86,21 @@ class ResearcherAgent:
         else:
             print(f"    WARN: {self.name} expected a dictionary for 'historical_precedent', but got {type(precedent_value)}. Value: {precedent_value}")
 
+        author_key = author_name.split(' ')[-1].lower()
+        return [
+            (f"On '{topic}', what are {author_name}'s views on '{core_principle}'?", author_key, 3),
+            (f"Details of '{precedent_issue}' from {author_name}'s writings?", author_key, 3),
+        ]
+
+    def _allied_queries(self, selector_output: Dict) -> List[Tuple[str, str, int]]:
+        """The allied-thinker lookup, or nothing if the Selector didn't name a usable ally."""
+        core_principle = selector_output.get("core_principle", "")
+
         # --- CORRECTED LOGIC FOR ALLIED THINKER ---
         allied_thinker_value = selector_output.get("allied_thinker", {})
         allied_thinker_name = ""
         allied_thinker_key = ""
-        
+
         if isinstance(allied_thinker_value, dict):
             allied_thinker_name = allied_thinker_value.get("name", "")
             if allied_thinker_name and isinstance(allied_thinker_name, str):
@@ -71,17 +113,36 @@ class ResearcherAgent:
                  # allied_thinker_key = allied_thinker_name.split(' ')[-1].lower() # Uncomment if you want to try using the string as name
         # --- END OF CORRECTION ---
 
-        author_key = author_name.split(' ')[-1].lower()
-        
-        principle_text = self.rag_system.query(f"On '{topic}', what are {author_name}'s views on '{core_principle}'?", author=author_key, top_k=3)
-        precedent_text = self.rag_system.query(f"Details of '{precedent_issue}' from {author_name}'s writings?", author=author_key, top_k=3)
-        
-        allied_thinker_text = ""
-        if allied_thinker_key: # Only query if we successfully got a key
-            allied_thinker_text = self.rag_system.query(f"Ideas of '{allied_thinker_name}' on '{core_principle}'?", author=allied_thinker_key, top_k=2)
-        
+        if not allied_thinker_key: # Only query if we successfully got a key
+            return []
+        return [(f"Ideas of '{allied_thinker_name}' on '{core_principle}'?", allied_thinker_key, 2)]
+
+    def research_core(self, selector_output: Dict, topic: str, author_name: str) -> Dict[str, str]:
+        """Principle and precedent retrieval only; the pipeline runs this alongside research_allied."""
+        print(f"     > Executing task for agent: {self.name} (principle/precedent) for {author_name}...")
+        principle_text, precedent_text = self._cached_query_many(self._core_queries(selector_output, topic, author_name))
+        return {"principle_text": principle_text, "precedent_text": precedent_text}
+
+    def research_allied(self, selector_output: Dict, author_name: str) -> Dict[str, str]:
+        """Allied-thinker retrieval only."""
+        print(f"     > Executing task for agent: {self.name} (allied thinker) for {author_name}...")
+        queries = self._allied_queries(selector_output)
+        return {"allied_thinker_text": self._cached_query_many(queries)[0] if queries else ""}
+
+    def run(self, selector_output: Dict, topic: str, author_name: str) -> Dict[str, str]:
+        print(f"     > Executing task for agent: {self.name} for {author_name}...")
+
+        # All of this founder's lookups share one embedding batch
+        core_queries = self._core_queries(selector_output, topic, author_name)
+        allied_queries = self._allied_queries(selector_output)
+        results = self._cached_query_many(core_queries + allied_queries)
+
         return {
-            "principle_text": principle_text,
-            "precedent_text": precedent_text,
-            "allied_thinker_text": allied_thinker_text
-        }
\ No newline at end of file
+            "principle_text": results[0],
+            "precedent_text": results[1],
+            "allied_thinker_text": results[2] if allied_queries else ""
+        }
+
+    async def run_async(self, selector_output: Dict, topic: str, author_name: str) -> Dict[str, str]:
+        # Retrieval is local CPU work; keep it off the event loop
+        return await asyncio.to_thread(self.run, selector_output, topic, author_name)
\ No newline at end of file
@@ -0,0 +1,33 @@
+# test_rate_limiter.py
+import asyncio
+import unittest
+
+import anthropic
+import httpx
+
+from rate_limiter import RateLimitController
+
+def _overloaded() -> anthropic.APIStatusError:
+    response = httpx.Response(529, request=httpx.Request("POST", "https://api.invalid/v1/messages"))
+    return anthropic.APIStatusError("Overloaded", response=response, body=None)
+
+class RateLimitControllerTest(unittest.TestCase):
+    def test_retried_call_returns_its_output_budget(self):
+        limiter = RateLimitController(output_tokens_per_minute=1000, base_delay=0.0)
+        attempts = []
+
+        async def send(client):
+            attempts.append(client)
+            if len(attempts) == 1:
+                raise _overloaded()
+            return "ok", {}, 0
+
+        result = asyncio.run(limiter.call(send, None, input_tokens=10, max_output_tokens=400))
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(limiter.stats()["retries"], 1)
+        # Neither the failed attempt nor the empty response used any output tokens
+        self.assertAlmostEqual(limiter.output_tokens.level, 1000, delta=1)
+
+if __name__ == "__main__":
+    unittest.main()
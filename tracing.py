@@ -0,0 +1,215 @@
+# tracing.py
+"""Structured timing spans for the agent pipeline, exported as JSONL.
+
+Spans nest through a context variable, so an API call made inside a founder's
+Thinker stage is tagged with that founder, topic, model type and stage. Tracing
+is off until `tracer.configure(path)` is called; until then `span()` does nothing.
+Summarize an exported trace with:
+
+    python tracing.py traces/<run_id>.jsonl
+"""
+import argparse
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Attributes a span passes down to every span opened inside it
+INHERITED_ATTRIBUTES = ("founder", "topic", "model_type", "stage")
+
+# USD per million tokens: (input, output, cache write, cache read). Matched by model-name prefix.
+MODEL_PRICES = {
+    "claude-opus-4": (15.0, 75.0, 18.75, 1.50),
+    "claude-sonnet-4": (3.0, 15.0, 3.75, 0.30),
+    "claude-haiku-4": (1.0, 5.0, 1.25, 0.10),
+    "claude-3-5-haiku": (0.80, 4.0, 1.0, 0.08),
+}
+# Message Batches are billed at half price
+BATCH_DISCOUNT = 0.5
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cache_creation_tokens: int = 0,
+                  cache_read_tokens: int = 0, batched: bool = False) -> Optional[float]:
+    """List-price cost of one response in USD, or None for a model without a known price."""
+    prices = next((prices for prefix, prices in MODEL_PRICES.items() if model.startswith(prefix)), None)
+    if prices is None:
+        return None
+    cost = (input_tokens * prices[0] + output_tokens * prices[1] + cache_creation_tokens * prices[2]
+            + cache_read_tokens * prices[3]) / 1_000_000
+    return cost * BATCH_DISCOUNT if batched else cost
+
+class Span:
+    """One timed operation. `attributes` holds everything else: tokens, retries, outcome."""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self._lock = threading.Lock()
+
+    def set(self, **attributes: Any):
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1):
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            attributes = dict(self.attributes)
+        return {"name": self.name, "span_id": self.span_id, "parent_id": self.parent_id,
+                "start": self.start, "duration": self.duration, **attributes}
+
+class _DisabledSpan:
+    """Stands in for a Span while tracing is off, so callers can set attributes unconditionally."""
+
+    def set(self, **attributes: Any):
+        pass
+
+    def add(self, key: str, amount: float = 1):
+        pass
+
+_DISABLED_SPAN = _DisabledSpan()
+
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+    """Collects finished spans in memory and appends each one to a JSONL file as it ends."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._file = None
+        self._lock = threading.Lock()
+
+    def configure(self, path: Optional[str]):
+        """Starts recording, appending spans to `path` if given. Passing None records in memory only."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.path = path
+            if path:
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._file = open(path, 'a', encoding='utf-8')
+            self.enabled = True
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.enabled = False
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Times the enclosed block and yields its Span (a no-op stand-in while tracing is off)."""
+        if not self.enabled:
+            yield _DISABLED_SPAN
+            return
+        parent = _current_span.get()
+        inherited = {key: parent.attributes[key] for key in INHERITED_ATTRIBUTES if parent is not None and key in parent.attributes}
+        span = Span(name, parent, {**inherited, **attributes})
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._finish(span)
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get() if self.enabled else None
+
+    def add(self, key: str, amount: float = 1):
+        """Adds to a counter on the innermost open span, e.g. retries inside an API call."""
+        span = self.current()
+        if span is not None:
+            span.add(key, amount)
+
+    def _finish(self, span: Span):
+        record = span.to_dict()
+        with self._lock:
+            self.spans.append(record)
+            if self._file is not None:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+# The process-wide tracer every module records into
+tracer = Tracer()
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty sample: the smallest value with at least `pct`% of
+    the sample at or below it. Shared by the trace summary and the benchmarks."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def summarize_spans(spans: List[Dict[str, Any]], span_name: str, key: str) -> List[Dict[str, Any]]:
+    """Groups `span_name` spans by attribute `key`, adding up the API calls made inside each group.
+
+    Durations give p50/p95; API calls (response-cache hits excluded), tokens, retries,
+    parse fallbacks and cost come from the llm_call and agent_task spans that carry
+    the same `key` value.
+    """
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for span in spans:
+        if span["name"] == span_name and span.get(key) is not None:
+            group = groups.setdefault(span[key], {key: span[key], "durations": [], "calls": 0, "input_tokens": 0,
+                                                   "output_tokens": 0, "cache_read_input_tokens": 0,
+                                                   "retries": 0, "parse_fallbacks": 0, "cost_usd": 0.0})
+            group["durations"].append(span["duration"])
+    for span in spans:
+        group = groups.get(span.get(key))
+        if group is None:
+            continue
+        if span["name"] == "llm_call" and span.get("response_cache") != "hit":
+            group["calls"] += 1
+            for field in ("input_tokens", "output_tokens", "cache_read_input_tokens", "retries"):
+                group[field] += span.get(field) or 0
+            group["cost_usd"] += span.get("cost_usd") or 0.0
+        elif span["name"] == "agent_task" and span.get("parse") == "fallback":
+            group["parse_fallbacks"] += 1
+    rows = []
+    for group in groups.values():
+        durations = group.pop("durations")
+        rows.append({**group, "count": len(durations), "total_seconds": sum(durations),
+                     "p50_seconds": percentile(durations, 50), "p95_seconds": percentile(durations, 95)})
+    # Biggest total time first: the stages worth optimizing
+    return sorted(rows, key=lambda row: row["total_seconds"], reverse=True)
+
+def print_trace_summary(spans: List[Dict[str, Any]]):
+    header = f"{'':<22} {'n':>4} {'p50 s':>7} {'p95 s':>7} {'total s':>8} {'calls':>5} {'in tok':>8} {'out tok':>8} {'cached':>8} {'retry':>5} {'fallbk':>6} {'cost $':>7}"
+    for title, span_name, key in (("Per stage", "stage", "stage"), ("Per founder", "pipeline", "founder")):
+        rows = summarize_spans(spans, span_name, key)
+        if not rows:
+            continue
+        print(f"\n--- {title} ---")
+        print(header)
+        for row in rows:
+            print(f"{str(row[key])[:22]:<22} {row['count']:>4} {row['p50_seconds']:>7.2f} {row['p95_seconds']:>7.2f} {row['total_seconds']:>8.1f}"
+                  f" {row['calls']:>5} {row['input_tokens']:>8} {row['output_tokens']:>8} {row['cache_read_input_tokens']:>8}"
+                  f" {row['retries']:>5} {row['parse_fallbacks']:>6} {row['cost_usd']:>7.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prints p50/p95 latency, tokens and cost per stage and per founder from a trace.")
+    parser.add_argument("traces", nargs="+", help="JSONL trace files written with --trace.")
+    args = parser.parse_args()
+    print_trace_summary([span for path in args.traces for span in load_spans(path)])